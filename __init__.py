@@ -1,13 +1,36 @@
-from google import genai
-from google.genai import types
-import json
-from pathlib import Path
-
-# Get the directory of the current script
-script_dir = Path(__file__).parent
-# Construct path to prompts.json
-prompts_path = script_dir / "prompts" /"prompts.json"
-prompts = json.load(open(prompts_path, "r"))
-# Initialize the GenAI client with your API key
-client = genai.Client(api_key="XXXXXXXXXXXXXXX")
-copilot = client.chats.create(model="gemini-2.5-flash" , config=types.GenerateContentConfig(system_instruction=prompts["system"]["prompt"]),)
+import json
+from functools import lru_cache
+from pathlib import Path
+
+# Get the directory of the current script
+script_dir = Path(__file__).parent
+# Construct path to prompts.json
+prompts_path = script_dir / "prompts" /"prompts.json"
+
+# The prompts, GenAI client and chat session are created on first access and
+# memoized per process, so importing the package stays cheap.
+@lru_cache(maxsize=None)
+def get_prompts():
+    """Loads prompts.json."""
+    with open(prompts_path, "r") as f:
+        return json.load(f)
+
+@lru_cache(maxsize=None)
+def get_client():
+    """Initializes the GenAI client with your API key."""
+    from google import genai
+    return genai.Client(api_key="XXXXXXXXXXXXXXX")
+
+@lru_cache(maxsize=None)
+def get_copilot():
+    """Creates the copilot chat session with the system prompt."""
+    from google.genai import types
+    return get_client().chats.create(model="gemini-2.5-flash" , config=types.GenerateContentConfig(system_instruction=get_prompts()["system"]["prompt"]),)
+
+_LAZY_ATTRIBUTES = {"prompts": get_prompts, "client": get_client, "copilot": get_copilot}
+
+def __getattr__(name):
+    # Keep `package.prompts`, `package.client` and `package.copilot` working
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,289 @@
+"""
+Headless command line interface for batch course generation.
+
+    python -m <package> generate notes/ --length "Quick (Overview)" --workers 4
+    python -m <package> validate courses/ --output-dir reviews
+    python -m <package> export courses/ --format pdf
+
+Every input file (directories are expanded to the supported files they
+contain) is processed as its own job on a worker pool, and results are
+written to --output-dir as <input name>.<command>.<format>.
+"""
+import argparse
+import io
+import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from .helpers import course_pipeline, export_service, instrumentation, job_queue, llm_utils, prompt_utils, review_pipeline, token_budget
+from .helpers.rate_limiter import rate_limiter
+from .helpers.text_utils import DOCX_TYPE, PDF_TYPE, TXT_TYPE, extract_text_from_files
+
+DEFAULT_MODEL = "gemini-1.5-flash-latest"
+# Number of input files processed concurrently
+CLI_WORKERS = int(os.environ.get("CLI_WORKERS", 4))
+STEP_TIMEOUT = 600
+
+INPUT_TYPES = {".pdf": PDF_TYPE, ".docx": DOCX_TYPE, ".txt": TXT_TYPE}
+EXPORT_INPUTS = (".md", ".markdown", ".txt", ".html", ".htm")
+# Exported inputs rendered with the HTML renderers; the rest are Markdown
+HTML_INPUTS = (".html", ".htm")
+OUTPUT_EXTENSIONS = {"md": "md", "pdf": "pdf", "docx": "docx", "html-pdf": "pdf", "html-docx": "docx"}
+
+# Same choices as the Streamlit selectors
+COURSE_LENGTHS = ["Quick (Overview)", "Moderate (Standard)", "Detailed (In-depth)"]
+TARGET_AUDIENCES = ["High School Students", "Undergraduate Students", "Industry Professionals", "General Public"]
+COURSE_TONES = ["Formal & Academic", "Conversational & Friendly", "Technical & Precise"]
+QUIZ_TYPES = ["Multiple Choice", "True/False", "Short Answer", "Mixed"]
+QUIZ_DIFFICULTIES = ["Easy", "Medium", "Hard", "Mixed"]
+
+logger = logging.getLogger(__name__)
+
+class LocalFile(io.BytesIO):
+    """A file on disk with the name/type/getvalue interface of a Streamlit upload."""
+
+    def __init__(self, path):
+        path = Path(path)
+        super().__init__(path.read_bytes())
+        self.name = path.name
+        self.type = INPUT_TYPES.get(path.suffix.lower(), "")
+
+def collect_inputs(paths, suffixes):
+    """Expands files and directories into a sorted list of input files with a supported suffix."""
+    inputs = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            inputs.extend(sorted(p for p in path.iterdir() if p.is_file() and p.suffix.lower() in suffixes))
+        elif path.is_file():
+            inputs.append(path)
+        else:
+            raise FileNotFoundError(f"No such file or directory: {path}")
+    return inputs
+
+def read_source_text(path):
+    """Extracts the text of a PDF, DOCX or TXT file; raises ValueError if nothing could be read."""
+    errors = []
+    raw_text = extract_text_from_files([LocalFile(path)], on_error=lambda source, error: errors.append(error))
+    if errors:
+        raise ValueError(f"Error reading file {path.name}: {errors[0]}")
+    if not raw_text.strip():
+        raise ValueError(f"Could not extract text from {path.name}")
+    return raw_text
+
+def find_api_key():
+    """Returns GOOGLE_API_KEY from the environment or .streamlit/secrets.toml."""
+    api_key = os.environ.get("GOOGLE_API_KEY")
+    secrets_path = Path.cwd() / ".streamlit" / "secrets.toml"
+    if not api_key and secrets_path.is_file():
+        import tomllib
+        with open(secrets_path, "rb") as f:
+            api_key = tomllib.load(f).get("GOOGLE_API_KEY")
+    if not api_key:
+        raise SystemExit("GOOGLE_API_KEY is not set (environment or .streamlit/secrets.toml)")
+    return api_key
+
+def create_model(model_name):
+    """Configures google.generativeai with the API key and returns the model."""
+    return job_queue.create_model(model_name, find_api_key())
+
+def plan_prompt(args, model, path, build_prompt, text=None):
+    """Builds the prompt for one input file (or text taken from it) within the command's token budget."""
+    if text is None:
+        text = read_source_text(path)
+    plan = token_budget.plan_prompt(
+        build_prompt, text, args.token_budget, args.budget_strategy,
+        model=model, use_cache=args.use_cache,
+    )
+    if plan.strategy is not None:
+        logger.info("%s: input is ~%d tokens, over the %d-token budget; applied %s (~%d tokens)",
+                    path.name, plan.source_tokens, args.token_budget, plan.strategy, plan.prompt_tokens)
+    return plan.prompt
+
+# --- Per-file jobs: each returns the Markdown result for one input file ---
+
+def run_generate(args, model, path):
+    prompt = plan_prompt(args, model, path, lambda text: prompt_utils.create_generation_prompt(
+        text, args.length, args.audience, args.tone
+    ))
+    return llm_utils.generate_text(model, prompt, timeout=STEP_TIMEOUT, use_cache=args.use_cache)
+
+def run_validate(args, model, path):
+    if args.single_request:
+        prompt = plan_prompt(args, model, path, prompt_utils.create_validation_prompt)
+        return llm_utils.generate_text(model, prompt, timeout=STEP_TIMEOUT, use_cache=args.use_cache)
+    return review_pipeline.validate_course(
+        model, read_source_text(path),
+        prepare_prompt=lambda text: plan_prompt(args, model, path, prompt_utils.create_validation_prompt, text),
+        use_cache=args.use_cache,
+    )
+
+def run_update(args, model, path):
+    if args.single_request:
+        prompt = plan_prompt(args, model, path, prompt_utils.create_updater_prompt)
+        return llm_utils.generate_text(model, prompt, timeout=STEP_TIMEOUT, use_cache=args.use_cache)
+    return review_pipeline.update_course(
+        model, read_source_text(path),
+        prepare_prompt=lambda text: plan_prompt(args, model, path, prompt_utils.create_updater_prompt, text),
+        use_cache=args.use_cache,
+    )
+
+def run_quiz(args, model, path):
+    prompt = plan_prompt(args, model, path, lambda text: prompt_utils.create_quiz_creator_prompt(
+        text, difficulty_level=args.difficulty, question_type=args.quiz_type
+    ))
+    return llm_utils.generate_text(model, prompt, timeout=STEP_TIMEOUT, use_cache=args.use_cache)
+
+def run_full_course(args, model, path):
+    def log_progress(message, completed, total):
+        logger.info("%s: %s (%d/%d)", path.name, message, completed, total)
+
+    course_sections = course_pipeline.generate_full_course(
+        model, read_source_text(path), args.length, args.audience, args.tone,
+        use_cache=args.use_cache, on_progress=log_progress,
+    )
+    return course_sections["Full Course"]
+
+def write_output(output_dir, path, command, text, file_format):
+    """Writes text (rendered to file_format unless it is 'md') and returns the output path."""
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = output_dir / f"{path.stem}.{command}.{OUTPUT_EXTENSIONS[file_format]}"
+    if file_format == "md":
+        output_path.write_text(text, encoding="utf-8")
+    else:
+        output_path.write_bytes(export_service.render(text, file_format))
+    return output_path
+
+def process_file(args, model, path):
+    """Runs the selected command for one input file and writes its result."""
+    text = args.handler(args, model, path)
+    return write_output(args.output_dir, path, args.command, text, args.format)
+
+def export_file(path, file_format, output_dir):
+    """
+    Renders one Markdown/HTML file to file_format (pdf or docx), picking the
+    renderer from the file's suffix. Runs inside a worker process.
+    """
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() in HTML_INPUTS:
+        file_format = f"html-{file_format}"
+    return write_output(output_dir, path, "export", text, file_format)
+
+def run_batch(args):
+    """Processes every input on a worker pool; returns the number of failed inputs."""
+    if args.metrics_jsonl:
+        # Set in the environment too, so worker processes log their spans as well
+        os.environ["METRICS_JSONL"] = str(args.metrics_jsonl)
+        instrumentation.recorder.jsonl_path = str(args.metrics_jsonl)
+    if args.command == "export":
+        inputs = collect_inputs(args.inputs, EXPORT_INPUTS)
+        # Rendering is CPU bound, so exports run in processes
+        executor = ProcessPoolExecutor(max_workers=max(1, args.workers))
+        submit = lambda path: executor.submit(export_file, path, args.format, args.output_dir)
+    else:
+        inputs = collect_inputs(args.inputs, INPUT_TYPES)
+        model = create_model(args.model)
+        if args.hedge:
+            llm_utils.HEDGE_REQUESTS = True
+        # Model calls are I/O bound, so generation runs in threads
+        executor = ThreadPoolExecutor(max_workers=max(1, args.workers))
+        submit = lambda path: executor.submit(process_file, args, model, path)
+
+    if not inputs:
+        logger.warning("No supported input files found")
+        return 0
+
+    failed = 0
+    with executor:
+        futures = {submit(path): path for path in inputs}
+        for future in as_completed(futures):
+            path = futures[future]
+            try:
+                logger.info("%s -> %s", path, future.result())
+            except Exception as e:
+                failed += 1
+                logger.error("%s failed: %s", path, e)
+    logger.info("%d of %d inputs completed", len(inputs) - failed, len(inputs))
+    if args.command != "export":
+        logger.info("Model calls: %s", rate_limiter.metrics())
+    for name, stats in instrumentation.recorder.snapshot().items():
+        logger.info("Timing %s: %d calls, %.3fs total, %.3fs mean", name, stats["count"], stats["seconds"], stats["mean_seconds"])
+    return failed
+
+def run_workers(args):
+    """Runs background job workers until interrupted."""
+    api_key = find_api_key()
+    if args.processes <= 1:
+        job_queue.run_worker(job_queue.job_queue.path, args.model, api_key)
+        return
+    # This process only waits for the workers, so they split the request limits between them
+    processes = job_queue.start_workers(args.processes, args.model, api_key, share_with_caller=False)
+    logger.info("Started %d workers on %s", len(processes), job_queue.job_queue.path)
+    for process in processes:
+        process.join()
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog=f"python -m {__package__ or 'package'}",
+        description="Generate, review and export courses without the Streamlit UI.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_command(name, handler, help, course_options=False, formats=("md", "pdf", "docx"), budget=None):
+        sub = subparsers.add_parser(name, help=help)
+        sub.add_argument("inputs", nargs="+", help="Input files or directories")
+        sub.add_argument("-o", "--output-dir", type=Path, default=Path("output"), help="Directory for results (default: output)")
+        sub.add_argument("-w", "--workers", type=int, default=CLI_WORKERS, help=f"Inputs processed concurrently (default: {CLI_WORKERS})")
+        sub.add_argument("-f", "--format", choices=formats, default=formats[0], help=f"Output format (default: {formats[0]})")
+        sub.add_argument("--metrics-jsonl", type=Path, help="Append a JSON line per timed operation to this file")
+        if handler is not None:
+            sub.add_argument("--model", default=DEFAULT_MODEL, help=f"Model name (default: {DEFAULT_MODEL})")
+            sub.add_argument("--no-cache", dest="use_cache", action="store_false", help="Bypass the response cache")
+            sub.add_argument("--hedge", action="store_true", help="Send a duplicate request when a section or summary call runs past the recent p95 latency")
+        if budget is not None:
+            sub.add_argument("--token-budget", type=int, default=token_budget.TOKEN_BUDGETS[budget],
+                             help=f"Input token budget per request (default: {token_budget.TOKEN_BUDGETS[budget]})")
+            sub.add_argument("--budget-strategy", choices=token_budget.STRATEGIES, default=token_budget.DEFAULT_STRATEGY,
+                             help=f"What to do with over-budget input (default: {token_budget.DEFAULT_STRATEGY})")
+        if course_options:
+            sub.add_argument("--length", choices=COURSE_LENGTHS, default=COURSE_LENGTHS[1])
+            sub.add_argument("--audience", choices=TARGET_AUDIENCES, default=TARGET_AUDIENCES[1])
+            sub.add_argument("--tone", choices=COURSE_TONES, default=COURSE_TONES[0])
+        sub.set_defaults(handler=handler)
+        return sub
+
+    add_command("generate", run_generate, "Generate a course from each source document", course_options=True, budget="generate")
+    validate = add_command("validate", run_validate, "Review each course for pedagogical quality", budget="validate")
+    validate.add_argument("--single-request", action="store_true", help="Review the whole course in one call instead of section by section")
+    update = add_command("update", run_update, "Suggest updates for each course", budget="update")
+    update.add_argument("--single-request", action="store_true", help="Update the whole course in one call instead of unit by unit")
+    quiz = add_command("quiz", run_quiz, "Create a quiz from each course", budget="quiz")
+    quiz.add_argument("--difficulty", choices=QUIZ_DIFFICULTIES, default="Medium")
+    quiz.add_argument("--type", dest="quiz_type", choices=QUIZ_TYPES, default="Mixed")
+    add_command("full-course", run_full_course, "Generate a table of contents, lessons and quizzes from each source document", course_options=True)
+    worker = subparsers.add_parser("worker", help="Run background job workers for jobs queued from the app")
+    worker.add_argument("-p", "--processes", type=int, default=job_queue.JOB_WORKERS,
+                        help=f"Worker processes (default: {job_queue.JOB_WORKERS})")
+    worker.add_argument("--model", default=DEFAULT_MODEL, help=f"Model name (default: {DEFAULT_MODEL})")
+    add_command("export", None, "Render Markdown or HTML files to PDF/DOCX", formats=("pdf", "docx"))
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    if args.command == "worker":
+        try:
+            run_workers(args)
+        except KeyboardInterrupt:
+            pass
+        return 0
+    try:
+        failed = run_batch(args)
+    except FileNotFoundError as e:
+        logger.error("%s", e)
+        return 2
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,26 +1,27 @@
 import streamlit as st
 import google.generativeai as genai
-from io import BytesIO
+import functools
 import re
 
-# --- Optional dependencies for download functionality ---
-try:
-    from fpdf import FPDF
-    import docx
-    from docx.shared import Pt
-    DOWNLOAD_ENABLED = True
-except ImportError:
-    DOWNLOAD_ENABLED = False
-
 # Ensure st is available globally before importing helpers
 try:
     from helpers.text_utils import extract_text_from_files
     from helpers import prompt_utils
+    from helpers import llm_utils
+    from helpers import course_pipeline
+    from helpers import token_budget
+    from helpers import review_pipeline
+    from helpers import job_queue
+    from helpers import instrumentation
+    from helpers.cache_utils import extraction_cache, response_cache
+    from helpers.rate_limiter import rate_limiter
+    from helpers import export_service
+    from helpers.export_utils import DOWNLOAD_ENABLED
 except ImportError:
     # Creating dummy functions if helpers are not available
     # This allows the app to run without the helper files for styling purposes.
     st.warning("Helper modules (helpers.text_utils, helpers.prompt_utils) not found. Using dummy functions. App functionality will be limited.")
-    def extract_text_from_files(files):
+    def extract_text_from_files(files, **kwargs):
         return " ".join([file.name for file in files])
     class PromptUtils:
         def create_generation_prompt(self, *args): return "Dummy generation prompt"
@@ -28,6 +29,20 @@ except ImportError:
         def create_updater_prompt(self, *args): return "Dummy updater prompt"
         def create_quiz_creator_prompt(self, *args): return "Dummy quiz prompt"
     prompt_utils = PromptUtils()
+    class LLMUtils:
+        def generate_text(self, model, prompt, timeout=600, **kwargs):
+            return model.generate_content(prompt, request_options={'timeout': timeout}).text
+        def stream_text(self, model, prompt, timeout=600, **kwargs):
+            yield self.generate_text(model, prompt, timeout)
+    llm_utils = LLMUtils()
+    token_budget = None
+    review_pipeline = None
+    job_queue = None
+    instrumentation = None
+    extraction_cache = None
+    response_cache = None
+    rate_limiter = None
+    DOWNLOAD_ENABLED = False
 
 except NameError as e:
     st.error(f"Import error in helper modules: {e}")
@@ -79,861 +94,22 @@ def create_descriptive_filename(content_type, user_params=None, content_text="",
     filename = "_".join(parts) + f".{file_extension}"
     return filename
     
-def create_styled_docx(text):
-    """Generates a DOCX file from a Markdown string with styling for headers, lists, and code."""
-    doc = docx.Document()
-    in_code_block = False
-    code_block_started = False  # Track if we just started a code block
-    
-    for line in text.split('\n'):
-        # Code block handling - FIX: Check for triple backticks
-        if line.strip().startswith('```'):
-            in_code_block = not in_code_block
-            if in_code_block:
-                # Only add spacing before code block if the previous element wasn't empty
-                code_block_started = True
-            else:
-                # Add some spacing after code block
-                doc.add_paragraph()
-                code_block_started = False
-            continue
-
-        if in_code_block:
-            # For code blocks, add paragraph with shaded background
-            p = doc.add_paragraph(line)
-            p.style = 'No Spacing'
-            
-            # Set font for code
-            if p.runs:
-                font = p.runs[0].font
-            else:
-                run = p.add_run('')
-                font = run.font
-            font.name = 'Courier New'
-            font.size = Pt(10)
-            
-            # Add shaded background to the paragraph
-            from docx.oxml.shared import qn
-            from docx.oxml import parse_xml
-            
-            # Create shading element with light gray background
-            shading_elm = parse_xml(r'<w:shd {} w:fill="F0F0F0"/>'.format(
-                'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
-            ))
-            p._element.get_or_add_pPr().append(shading_elm)
-            
-            # Add border around code block paragraphs
-            from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
-            p.alignment = WD_PARAGRAPH_ALIGNMENT.LEFT
-            
-            # Set paragraph spacing for code blocks
-            paragraph_format = p.paragraph_format
-            paragraph_format.left_indent = Pt(12)  # Slight indentation
-            paragraph_format.right_indent = Pt(12)
-            
-            # Only add space before the first line of the code block
-            if code_block_started:
-                paragraph_format.space_before = Pt(6)
-                code_block_started = False
-            else:
-                paragraph_format.space_before = Pt(2)
-            
-            paragraph_format.space_after = Pt(2)
-            
-            continue
-
-        # Other markdown handling (rest of the function remains the same)
-        line = line.strip()
-        if line.startswith('# '):
-            doc.add_heading(line[2:], level=1)
-        elif line.startswith('## '):
-            doc.add_heading(line[3:], level=2)
-        elif line.startswith('### '):
-            doc.add_heading(line[4:], level=3)
-        elif line.startswith(('* ', '- ')):
-            p = doc.add_paragraph(style='List Bullet')
-            # Handle inline styles (bold, italic, code)
-            parts = re.split(r'(\*\*.*?\*\*|\*.*?\*|\`.*?\`)', line[2:])
-            for part in parts:
-                if not part: continue
-                if part.startswith('**') and part.endswith('**'):
-                    p.add_run(part[2:-2]).bold = True
-                elif part.startswith('*') and part.endswith('*'):
-                    p.add_run(part[1:-1]).italic = True
-                elif part.startswith('`') and part.endswith('`'):
-                    run = p.add_run(part[1:-1])
-                    run.font.name = 'Courier New'
-                    # Add light gray background for inline code
-                    from docx.oxml.shared import qn
-                    from docx.oxml import parse_xml
-                    shading_elm = parse_xml(r'<w:shd {} w:fill="E8E8E8"/>'.format(
-                        'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
-                    ))
-                    run._element.get_or_add_rPr().append(shading_elm)
-                else:
-                    p.add_run(part)
-        elif line:
-            p = doc.add_paragraph()
-            # Handle inline styles (bold, italic, code)
-            parts = re.split(r'(\*\*.*?\*\*|\*.*?\*|\`.*?\`)', line)
-            for part in parts:
-                if not part: continue
-                if part.startswith('**') and part.endswith('**'):
-                    p.add_run(part[2:-2]).bold = True
-                elif part.startswith('*') and part.endswith('*'):
-                    p.add_run(part[1:-1]).italic = True
-                elif part.startswith('`') and part.endswith('`'):
-                    run = p.add_run(part[1:-1])
-                    run.font.name = 'Courier New'
-                    # Add light gray background for inline code
-                    from docx.oxml.shared import qn
-                    from docx.oxml import parse_xml
-                    shading_elm = parse_xml(r'<w:shd {} w:fill="E8E8E8"/>'.format(
-                        'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
-                    ))
-                    run._element.get_or_add_rPr().append(shading_elm)
-                else:
-                    p.add_run(part)
-
-    doc_fp = BytesIO()
-    doc.save(doc_fp)
-    doc_fp.seek(0)
-    return doc_fp.getvalue()
-
-def create_html_docx(html_text):
-    """
-    Generates a DOCX file from an HTML string with styling 
-    for headers, lists, bold, italic, and other HTML elements.
-    """
-    from html.parser import HTMLParser
-    import html
-    
-    class HTMLToDocxParser(HTMLParser):
-        def __init__(self, doc):
-            super().__init__()
-            self.doc = doc
-            self.current_paragraph = None
-            self.current_run = None
-            self.style_stack = []  # Stack to track nested styles
-            self.in_list = False
-            self.list_stack = []  # Stack to track nested lists
-            self.list_counters = []  # Stack to track list item counters
-            self.current_text = ""
-            self.pending_paragraph = False
-            
-        def handle_starttag(self, tag, attrs):
-            self.flush_text()
-            
-            if tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                level = int(tag[1])
-                # Add spacing before headers (except if it's the first element)
-                if len(self.doc.paragraphs) > 0:
-                    self.doc.add_paragraph()
-                self.current_paragraph = self.doc.add_heading('', level=level)
-                self.current_run = None
-            elif tag == 'p':
-                # Only add paragraph if we don't already have one or if we have content
-                if self.current_paragraph is None or len(self.doc.paragraphs) > 0:
-                    self.current_paragraph = self.doc.add_paragraph()
-                self.current_run = None
-            elif tag in ['b', 'strong']:
-                self.style_stack.append('bold')
-                self._ensure_run()
-            elif tag in ['i', 'em']:
-                self.style_stack.append('italic')
-                self._ensure_run()
-            elif tag == 'code':
-                self.style_stack.append('code')
-                self._ensure_run()
-            elif tag == 'pre':
-                # Add spacing before pre block
-                if len(self.doc.paragraphs) > 0:
-                    self.doc.add_paragraph()
-                self.current_paragraph = self.doc.add_paragraph()
-                self.current_paragraph.style = 'No Spacing'
-                self.style_stack.append('pre')
-                self._ensure_run()
-            elif tag == 'ul':
-                self.in_list = True
-                self.list_stack.append('bullet')
-                self.list_counters.append(0)  # Not used for bullets but keeps stack aligned
-                # Add spacing before list
-                if len(self.doc.paragraphs) > 0 and not self.current_paragraph:
-                    self.doc.add_paragraph()
-            elif tag == 'ol':
-                self.in_list = True
-                self.list_stack.append('number')
-                self.list_counters.append(0)  # Counter for numbered items
-                # Add spacing before list
-                if len(self.doc.paragraphs) > 0 and not self.current_paragraph:
-                    self.doc.add_paragraph()
-            elif tag == 'li':
-                if self.list_stack:
-                    list_type = self.list_stack[-1]
-                    if list_type == 'number':
-                        # Increment counter for this list level
-                        self.list_counters[-1] += 1
-                        self.current_paragraph = self.doc.add_paragraph(style='List Number')
-                    else:
-                        self.current_paragraph = self.doc.add_paragraph(style='List Bullet')
-                else:
-                    # Fallback to bullet if no list context
-                    self.current_paragraph = self.doc.add_paragraph(style='List Bullet')
-                self.current_run = None
-            elif tag == 'br':
-                if self.current_paragraph is None:
-                    self.current_paragraph = self.doc.add_paragraph()
-                self.current_paragraph.add_run().add_break()
-                
-        def handle_endtag(self, tag):
-            self.flush_text()
-            
-            if tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                self.current_paragraph = None
-                self.current_run = None
-            elif tag == 'p':
-                self.current_paragraph = None
-                self.current_run = None
-            elif tag in ['b', 'strong', 'i', 'em', 'code']:
-                if self.style_stack and self.style_stack[-1] in ['bold', 'italic', 'code']:
-                    self.style_stack.pop()
-                self.current_run = None  # Force new run creation
-            elif tag == 'pre':
-                if 'pre' in self.style_stack:
-                    self.style_stack.remove('pre')
-                self.current_paragraph = None
-                self.current_run = None
-                # Add spacing after pre block
-                self.doc.add_paragraph()
-            elif tag in ['ul', 'ol']:
-                if self.list_stack:
-                    self.list_stack.pop()
-                    self.list_counters.pop()
-                self.in_list = len(self.list_stack) > 0
-                if not self.in_list:
-                    # Add spacing after outermost list
-                    self.doc.add_paragraph()
-            elif tag == 'li':
-                self.current_paragraph = None
-                self.current_run = None
-                
-        def handle_data(self, data):
-            # Decode HTML entities and clean up excessive whitespace
-            data = html.unescape(data)
-            # Only add non-empty text
-            if data.strip():
-                self.current_text += data.strip() + " "
-            
-        def flush_text(self):
-            if self.current_text.strip():
-                self._ensure_paragraph()
-                self._ensure_run()
-                
-                # Apply styles from stack
-                text_to_add = self.current_text.strip()
-                run = self.current_run.add_run(text_to_add) if hasattr(self.current_run, 'add_run') else self.current_paragraph.add_run(text_to_add)
-                
-                # Apply formatting based on style stack
-                if 'bold' in self.style_stack:
-                    run.bold = True
-                if 'italic' in self.style_stack:
-                    run.italic = True
-                if 'code' in self.style_stack or 'pre' in self.style_stack:
-                    run.font.name = 'Courier New'
-                    run.font.size = Pt(10)
-                    # Add light gray background for code
-                    from docx.oxml.shared import qn
-                    from docx.oxml import parse_xml
-                    try:
-                        shading_elm = parse_xml(r'<w:shd {} w:fill="E8E8E8"/>'.format(
-                            'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
-                        ))
-                        run._element.get_or_add_rPr().append(shading_elm)
-                    except:
-                        pass  # Skip styling if it fails
-                
-                self.current_text = ""
-        
-        def _ensure_paragraph(self):
-            if self.current_paragraph is None:
-                self.current_paragraph = self.doc.add_paragraph()
-        
-        def _ensure_run(self):
-            if self.current_run is None:
-                self._ensure_paragraph()
-                self.current_run = self.current_paragraph
-    
-    # Create the document and parse the HTML
-    doc = docx.Document()
-    parser = HTMLToDocxParser(doc)
-    parser.feed(html_text)
-    parser.flush_text()  # Flush any remaining text
-    
-    # Save to BytesIO and return
-    doc_fp = BytesIO()
-    doc.save(doc_fp)
-    doc_fp.seek(0)
-    return doc_fp.getvalue()
-
-def process_pdf_inline_styles(pdf, line, indent):
-    """Helper to process a line with inline markdown for PDF `write` method, handling wrapping."""
-    parts = re.split(r'(\*\*.*?\*\*|\*.*?\*|\`.*?\`)', line)
-    for part in parts:
-        if not part: continue
-        
-        style = ''
-        font = 'Arial'
-        size = 12
-        if part.startswith('**') and part.endswith('**'):
-            content = part[2:-2]
-            style = 'B'
-        elif part.startswith('*') and part.endswith('*'):
-            content = part[1:-1]
-            style = 'I'
-        elif part.startswith('`') and part.endswith('`'):
-            content = part[1:-1]
-            font = 'Courier'
-            style = ''
-            size = 10
-        else:
-            content = part
-        
-        pdf.set_font(font, style, size)
-        
-        # Manual word wrapping for the `write` method
-        words = content.split(' ')
-        for word in words:
-            word_to_write = word + ' '
-            word_width = pdf.get_string_width(word_to_write)
-            if pdf.get_x() + word_width > pdf.w - pdf.r_margin:
-                pdf.ln()
-                pdf.set_x(indent) # Re-apply indent for wrapped line
-            pdf.write(5, word_to_write.encode('latin-1', 'replace').decode('latin-1'))
-    
-    pdf.set_font('Arial', '', 12) # Reset font at the end of the line
+def render_export(text, file_format):
+    """Renders text on the background export service and waits for the bytes."""
+    return export_service.submit_export(text, file_format).result()
 
-def create_styled_pdf(text):
+def export_download_button(label, text, file_format, file_name, mime):
     """
-    Generates a PDF file from a Markdown string with native styling
-    for headers, lists, bold, italic, and code.
+    Download button whose file is only rendered when it is clicked, in the
+    background export service; repeat downloads of the same text reuse it.
     """
-    try:
-        pdf = FPDF()
-        pdf.add_page()
-        
-        # Simplified font handling - stick to built-in fonts
-        pdf.set_font('Arial', size=12)
-        unicode_support = False  # Disable Unicode to avoid font issues
-        default_font = 'Arial'
-        
-        effective_page_width = pdf.w - 2 * pdf.l_margin
-
-        in_code_block = False
-        for line in text.split('\n'):
-            # Code block handling
-            if line.strip().startswith('```'):
-                in_code_block = not in_code_block
-                if in_code_block:
-                    pdf.set_font('Courier', size=10)
-                    pdf.set_fill_color(240, 240, 240)
-                    pdf.ln(2)
-                else:
-                    pdf.set_font('Arial', size=12)
-                    pdf.set_fill_color(255, 255, 255)
-                    pdf.ln(5)
-                continue
-
-            if in_code_block:
-                pdf.set_x(pdf.l_margin)
-                # Ensure safe encoding for code blocks
-                safe_line = line.encode('latin-1', 'replace').decode('latin-1')
-                pdf.multi_cell(effective_page_width, 5, safe_line, border=0, fill=True)
-                continue
-
-            # Other markdown handling
-            line = line.strip()
-            if not line:
-                pdf.ln(5)
-                continue
-
-            # Safe text encoding for all content
-            if line.startswith('# '):
-                pdf.set_font('Arial', 'B', 16)
-                safe_text = line[2:].strip().encode('latin-1', 'replace').decode('latin-1')
-                pdf.multi_cell(effective_page_width, 8, safe_text)
-                pdf.ln(4)
-            elif line.startswith('## '):
-                pdf.set_font('Arial', 'B', 14)
-                safe_text = line[3:].strip().encode('latin-1', 'replace').decode('latin-1')
-                pdf.multi_cell(effective_page_width, 7, safe_text)
-                pdf.ln(3)
-            elif line.startswith('### '):
-                pdf.set_font('Arial', 'B', 12)
-                safe_text = line[4:].strip().encode('latin-1', 'replace').decode('latin-1')
-                pdf.multi_cell(effective_page_width, 6, safe_text)
-                pdf.ln(2)
-            elif line.startswith(('* ', '- ')):
-                pdf.set_x(pdf.l_margin)
-                initial_x = pdf.get_x()
-                pdf.write(5, '- ')
-                process_pdf_inline_styles_safe(pdf, line[2:].strip(), initial_x + 5)
-                pdf.ln()
-            else:
-                pdf.set_x(pdf.l_margin)
-                process_pdf_inline_styles_safe(pdf, line, pdf.l_margin)
-                pdf.ln()
-
-        pdf_fp = BytesIO()
-        pdf.output(pdf_fp)
-        pdf_fp.seek(0)
-        return pdf_fp.getvalue()
-        
-    except Exception as e:
-        # If PDF generation fails, create a simple fallback PDF
-        st.error(f"PDF generation failed: {e}")
-        return create_fallback_pdf(text)
-
-def process_pdf_inline_styles_safe(pdf, line, indent):
-    """Simplified version of inline style processing with better error handling"""
-    try:
-        parts = re.split(r'(\*\*.*?\*\*|\*.*?\*|\`.*?\`)', line)
-        for part in parts:
-            if not part: 
-                continue
-            
-            style = ''
-            font = 'Arial'
-            size = 12
-            
-            if part.startswith('**') and part.endswith('**'):
-                content = part[2:-2]
-                style = 'B'
-            elif part.startswith('*') and part.endswith('*'):
-                content = part[1:-1]
-                style = 'I'
-            elif part.startswith('`') and part.endswith('`'):
-                content = part[1:-1]
-                font = 'Courier'
-                size = 10
-            else:
-                content = part
-            
-            # Ensure safe encoding
-            safe_content = content.encode('latin-1', 'replace').decode('latin-1')
-            
-            pdf.set_font(font, style, size)
-            
-            # Simple word wrapping
-            words = safe_content.split(' ')
-            for word in words:
-                word_to_write = word + ' '
-                word_width = pdf.get_string_width(word_to_write)
-                if pdf.get_x() + word_width > pdf.w - pdf.r_margin:
-                    pdf.ln()
-                    pdf.set_x(indent)
-                pdf.write(5, word_to_write)
-        
-        pdf.set_font('Arial', '', 12)
-        
-    except Exception as e:
-        # Fallback to simple text if styling fails
-        safe_text = line.encode('latin-1', 'replace').decode('latin-1')
-        pdf.set_font('Arial', '', 12)
-        pdf.multi_cell(pdf.w - 2 * pdf.l_margin, 5, safe_text)
-
-def create_fallback_pdf(text):
-    """Create a simple PDF if the styled version fails"""
-    try:
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font('Arial', size=12)
-        
-        # Simple text conversion - remove markdown
-        clean_text = re.sub(r'\*\*([^*]+)\*\*', r'\1', text)  # Remove bold
-        clean_text = re.sub(r'\*([^*]+)\*', r'\1', clean_text)  # Remove italic
-        clean_text = re.sub(r'`([^`]+)`', r'\1', clean_text)  # Remove code
-        clean_text = re.sub(r'^#+\s*', '', clean_text, flags=re.MULTILINE)  # Remove headers
-        
-        # Encode safely
-        safe_text = clean_text.encode('latin-1', 'replace').decode('latin-1')
-        
-        pdf.multi_cell(pdf.w - 2 * pdf.l_margin, 5, safe_text)
-        
-        pdf_fp = BytesIO()
-        pdf.output(pdf_fp)
-        pdf_fp.seek(0)
-        return pdf_fp.getvalue()
-        
-    except Exception as e:
-        st.error(f"Even fallback PDF generation failed: {e}")
-        return b"PDF generation failed"
-
-
-def create_html_pdf(html_text):
-    """
-    Generates a PDF file from an HTML string with styling
-    for headers, lists, bold, italic, and other HTML elements.
-    Properly handles ordered lists with numbers and nested lists with letters.
-    """
-    from html.parser import HTMLParser
-    import html
-    
-    class HTMLToPDFParser(HTMLParser):
-        def __init__(self, pdf):
-            super().__init__()
-            self.pdf = pdf
-            self.font_stack = [('Arial', '', 12)]  # Stack to track font changes
-            self.in_code = False
-            self.in_pre = False
-            self.list_stack = []  # Stack to track list types and levels
-            self.list_counters = []  # Stack to track counters for each list level
-            self.list_indent_level = 0
-            self.base_indent = 10  # Base indentation for lists
-            self.current_text = ""
-            self.unicode_support = False
-            self.last_was_block_element = False
-            self.in_list_item = False
-            self.list_item_first_line = True
-            
-        def get_current_indent(self):
-            """Calculate current indentation based on list nesting level"""
-            return self.pdf.l_margin + (self.list_indent_level * self.base_indent)
-            
-        def handle_starttag(self, tag, attrs):
-            self.flush_text()
-            
-            if tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                # Add spacing before headers
-                if not self.last_was_block_element and self.pdf.get_y() > 20:
-                    self.pdf.ln(8)
-                
-                level = int(tag[1])
-                size = max(16 - (level - 1) * 2, 10)
-                self.pdf.set_font('Arial', 'B', size)
-                self.last_was_block_element = True
-                
-            elif tag == 'p':
-                # Add spacing before paragraphs (but not if we're in a list item)
-                if not self.last_was_block_element and self.pdf.get_y() > 20 and not self.in_list_item:
-                    self.pdf.ln(4)
-                self.last_was_block_element = True
-                
-            elif tag == 'b' or tag == 'strong':
-                current_font = self.font_stack[-1]
-                new_style = current_font[1] + 'B' if 'B' not in current_font[1] else current_font[1]
-                self.font_stack.append((current_font[0], new_style, current_font[2]))
-                self.pdf.set_font(current_font[0], new_style, current_font[2])
-                
-            elif tag == 'i' or tag == 'em':
-                current_font = self.font_stack[-1]
-                new_style = current_font[1] + 'I' if 'I' not in current_font[1] else current_font[1]
-                self.font_stack.append((current_font[0], new_style, current_font[2]))
-                self.pdf.set_font(current_font[0], new_style, current_font[2])
-                
-            elif tag == 'code':
-                self.in_code = True
-                self.font_stack.append(('Courier', '', 10))
-                self.pdf.set_font('Courier', '', 10)
-                
-            elif tag == 'pre':
-                # Add spacing before pre block
-                if not self.last_was_block_element:
-                    self.pdf.ln(4)
-                self.in_pre = True
-                self.pdf.set_font('Courier', '', 10)
-                self.pdf.set_fill_color(240, 240, 240)
-                self.last_was_block_element = True
-                
-            elif tag == 'ul':
-                # Add spacing before lists (only for outermost lists)
-                if self.list_indent_level == 0 and not self.last_was_block_element:
-                    self.pdf.ln(4)
-                
-                self.list_stack.append('ul')
-                self.list_counters.append(0)  # Not used for bullets but keeps stack aligned
-                self.list_indent_level += 1
-                self.last_was_block_element = True
-                
-            elif tag == 'ol':
-                # Add spacing before lists (only for outermost lists)
-                if self.list_indent_level == 0 and not self.last_was_block_element:
-                    self.pdf.ln(4)
-                
-                self.list_stack.append('ol')
-                self.list_counters.append(0)  # Counter for numbered items
-                self.list_indent_level += 1
-                self.last_was_block_element = True
-                
-            elif tag == 'li':
-                self.in_list_item = True
-                self.list_item_first_line = True
-                
-                # Move to new line for list item
-                if self.pdf.get_x() > self.pdf.l_margin:
-                    self.pdf.ln()
-                
-                # Set proper indentation
-                current_indent = self.get_current_indent()
-                self.pdf.set_x(current_indent)
-                
-                if self.list_stack:
-                    list_type = self.list_stack[-1]
-                    if list_type == 'ol':
-                        # Increment counter and use number
-                        self.list_counters[-1] += 1
-                        counter = self.list_counters[-1]
-                        
-                        # Format number based on nesting level
-                        if self.list_indent_level == 1:
-                            # Top level: 1. 2. 3.
-                            number_text = f"{counter}. "
-                        elif self.list_indent_level == 2:
-                            # Second level: a) b) c)
-                            letter = chr(ord('a') + counter - 1) if counter <= 26 else f"item{counter}"
-                            number_text = f"{letter}) "
-                        elif self.list_indent_level == 3:
-                            # Third level: i. ii. iii.
-                            roman_numerals = ['i', 'ii', 'iii', 'iv', 'v', 'vi', 'vii', 'viii', 'ix', 'x']
-                            roman = roman_numerals[counter - 1] if counter <= len(roman_numerals) else f"item{counter}"
-                            number_text = f"{roman}. "
-                        else:
-                            # Deeper levels: fallback to numbers
-                            number_text = f"{counter}. "
-                            
-                        try:
-                            self.pdf.write(5, number_text)
-                        except:
-                            # Fallback for encoding issues
-                            safe_text = number_text.encode('ascii', 'replace').decode('ascii')
-                            self.pdf.write(5, safe_text)
-                    else:
-                        # Use different bullet styles based on nesting level
-                        if self.list_indent_level == 1:
-                            bullet_char = '• ' if self.unicode_support else '* '
-                        elif self.list_indent_level == 2:
-                            bullet_char = '◦ ' if self.unicode_support else '- '
-                        else:
-                            bullet_char = '▪ ' if self.unicode_support else '+ '
-                            
-                        try:
-                            self.pdf.write(5, bullet_char)
-                        except:
-                            self.pdf.write(5, '- ')
-                else:
-                    # Fallback bullet if no list context
-                    try:
-                        self.pdf.write(5, '• ')
-                    except:
-                        self.pdf.write(5, '- ')
-                    
-            elif tag == 'br':
-                self.pdf.ln()
-                # Maintain indentation if we're in a list item
-                if self.in_list_item:
-                    # Calculate the indent for continuation lines (after the bullet/number)
-                    current_indent = self.get_current_indent()
-                    bullet_width = 15  # Approximate width of bullet/number + space
-                    self.pdf.set_x(current_indent + bullet_width)
-                    self.list_item_first_line = False
-                else:
-                    self.pdf.set_x(self.pdf.l_margin)
-                
-        def handle_endtag(self, tag):
-            self.flush_text()
-            
-            if tag in ['h1', 'h2', 'h3', 'h4', 'h5', 'h6']:
-                self.pdf.ln(6)  # Space after headers
-                self.pdf.set_font('Arial', '', 12)  # Reset font
-                self.pdf.set_x(self.pdf.l_margin)  # Reset position
-                self.last_was_block_element = True
-                
-            elif tag == 'p':
-                # Only add line break if we're not in a list item
-                if not self.in_list_item:
-                    self.pdf.ln(4)  # Space after paragraphs
-                    self.pdf.set_x(self.pdf.l_margin)  # Reset position
-                self.last_was_block_element = True
-                
-            elif tag in ['b', 'strong', 'i', 'em', 'code']:
-                if len(self.font_stack) > 1:
-                    self.font_stack.pop()
-                current_font = self.font_stack[-1]
-                self.pdf.set_font(current_font[0], current_font[1], current_font[2])
-                if tag == 'code':
-                    self.in_code = False
-                    
-            elif tag == 'pre':
-                self.in_pre = False
-                self.pdf.set_fill_color(255, 255, 255)  # Reset background
-                self.pdf.set_font('Arial', '', 12)  # Reset font
-                self.pdf.ln(6)  # Space after pre block
-                self.pdf.set_x(self.pdf.l_margin)  # Reset position
-                self.last_was_block_element = True
-                
-            elif tag in ['ul', 'ol']:
-                if self.list_stack:
-                    self.list_stack.pop()
-                    self.list_counters.pop()
-                    self.list_indent_level -= 1
-                    
-                # Add spacing after outermost list
-                if self.list_indent_level == 0:
-                    self.pdf.ln(4)
-                    self.pdf.set_x(self.pdf.l_margin)
-                    self.last_was_block_element = True
-                
-            elif tag == 'li':
-                self.in_list_item = False
-                self.list_item_first_line = True
-                self.pdf.ln()  # New line after list item
-                
-        def handle_data(self, data):
-            """Handle text data between HTML tags"""
-            # Decode HTML entities and clean up excessive whitespace
-            data = html.unescape(data)
-            # Only add non-empty text
-            if data.strip():
-                self.current_text += data.strip() + " "
-        
-        def flush_text(self):
-            """Write accumulated text to PDF with proper wrapping and indentation"""
-            if self.current_text.strip():
-                # Handle Unicode encoding
-                safe_text = self.current_text.strip()
-                if not self.unicode_support:
-                    safe_text = safe_text.encode('latin-1', 'replace').decode('latin-1')
-                
-                # Calculate available width for text
-                if self.in_list_item:
-                    current_indent = self.get_current_indent()
-                    if self.list_item_first_line:
-                        # First line: text starts after bullet/number
-                        bullet_width = 15
-                        available_width = self.pdf.w - current_indent - bullet_width - self.pdf.r_margin
-                        start_x = current_indent + bullet_width
-                    else:
-                        # Continuation lines: align with first line text
-                        bullet_width = 15
-                        available_width = self.pdf.w - current_indent - bullet_width - self.pdf.r_margin
-                        start_x = current_indent + bullet_width
-                        self.pdf.set_x(start_x)
-                else:
-                    available_width = self.pdf.w - self.pdf.l_margin - self.pdf.r_margin
-                    start_x = self.pdf.l_margin
-                
-                # Manual word wrapping
-                words = safe_text.split(' ')
-                current_line = ""
-                
-                for word in words:
-                    test_line = current_line + (" " if current_line else "") + word
-                    test_width = self.pdf.get_string_width(test_line)
-                    
-                    if test_width <= available_width or not current_line:
-                        current_line = test_line
-                    else:
-                        # Write current line and start new one
-                        try:
-                            self.pdf.write(5, current_line)
-                        except:
-                            self.pdf.write(5, current_line.encode('ascii', 'replace').decode('ascii'))
-                        
-                        self.pdf.ln()
-                        
-                        # Set proper indentation for continuation
-                        if self.in_list_item:
-                            current_indent = self.get_current_indent()
-                            bullet_width = 15
-                            self.pdf.set_x(current_indent + bullet_width)
-                            self.list_item_first_line = False
-                        else:
-                            self.pdf.set_x(self.pdf.l_margin)
-                        
-                        current_line = word
-                
-                # Write remaining text
-                if current_line:
-                    try:
-                        self.pdf.write(5, current_line + " ")
-                    except:
-                        self.pdf.write(5, current_line.encode('ascii', 'replace').decode('ascii') + " ")
-                
-                self.current_text = ""
-                self.last_was_block_element = False
-                if self.in_list_item:
-                    self.list_item_first_line = False
-    
-    # Create the PDF and parse the HTML
-    pdf = FPDF()
-    pdf.add_page()
-    
-    # Add Unicode font support
-    try:
-        # Try to add a Unicode font (DejaVu Sans supports most Unicode characters)
-        pdf.add_font('DejaVu', '', 'DejaVuSans.ttf', uni=True)
-        pdf.add_font('DejaVu', 'B', 'DejaVuSans-Bold.ttf', uni=True)
-        pdf.add_font('DejaVu', 'I', 'DejaVuSans-Oblique.ttf', uni=True)
-        default_font = 'DejaVu'
-        unicode_support = True
-    except:
-        # Fallback to Arial if Unicode fonts are not available
-        default_font = 'Arial'
-        unicode_support = False
-    
-    pdf.set_font(default_font, size=12)
-    
-    parser = HTMLToPDFParser(pdf)
-    parser.unicode_support = unicode_support
-    parser.feed(html_text)
-    parser.flush_text()  # Flush any remaining text
-    
-    # Save to BytesIO and return
-    pdf_fp = BytesIO()
-    pdf.output(pdf_fp)
-    pdf_fp.seek(0)
-    return pdf_fp.getvalue()
-
-def process_pdf_inline_styles(pdf, line, indent, unicode_support=False, default_font='Arial'):
-    """Helper to process a line with inline markdown for PDF `write` method, handling wrapping."""
-    parts = re.split(r'(\*\*.*?\*\*|\*.*?\*|\`.*?\`)', line)
-    for part in parts:
-        if not part: continue
-        
-        style = ''
-        font = default_font
-        size = 12
-        if part.startswith('**') and part.endswith('**'):
-            content = part[2:-2]
-            style = 'B'
-        elif part.startswith('*') and part.endswith('*'):
-            content = part[1:-1]
-            style = 'I'
-        elif part.startswith('`') and part.endswith('`'):
-            content = part[1:-1]
-            font = 'Courier' if not unicode_support else default_font
-            style = ''
-            size = 10
-        else:
-            content = part
-        
-        pdf.set_font(font, style, size)
-        
-        # Handle Unicode encoding
-        safe_content = content if unicode_support else content.encode('latin-1', 'replace').decode('latin-1')
-        
-        # Manual word wrapping for the `write` method
-        words = safe_content.split(' ')
-        for word in words:
-            word_to_write = word + ' '
-            word_width = pdf.get_string_width(word_to_write)
-            if pdf.get_x() + word_width > pdf.w - pdf.r_margin:
-                pdf.ln()
-                pdf.set_x(indent)
-            pdf.write(5, word_to_write)
-    
-    pdf.set_font(default_font, '', 12)
-
-
+    st.download_button(
+        label=label,
+        data=functools.partial(render_export, text, file_format),
+        file_name=file_name,
+        mime=mime,
+        use_container_width=True
+    )
 
 # Page Configuration
 st.set_page_config(layout="wide", page_title="RoboGarden AI Content Creator")
@@ -1132,6 +308,140 @@ except Exception as e:
     st.error(f"Failed to configure Google AI: {e}")
     st.stop()
 
+BUDGET_STRATEGY_LABELS = {
+    "chunk": "Keep representative excerpts",
+    "summarize": "Summarize it first",
+    "reject": "Stop with an error",
+}
+BUDGET_FEATURE_LABELS = {
+    "generate": "Course Architect",
+    "validate": "Content Reviewer",
+    "update": "Future-Proofing Engine",
+    "quiz": "Quiz Creator",
+}
+
+@st.fragment(run_every="2s")
+def show_rate_limiter_metrics():
+    """Shows the shared model-call limiter state, refreshed while the page is open."""
+    metrics = rate_limiter.metrics()
+    p95 = llm_utils.latency_tracker.percentile(95)
+    st.caption(
+        f"Model calls: window {metrics['window']:g} · in flight {metrics['in_flight']} · "
+        f"queued {metrics['queue_depth']} · throttled {metrics['throttled']}"
+        + (f" · p95 {p95:.1f}s" if p95 is not None else "")
+        + f" · coalesced {llm_utils.single_flight.coalesced}"
+    )
+
+# --- Sidebar: runtime settings and cache statistics ---
+with st.sidebar:
+    st.subheader("⚙️ Settings")
+    use_response_cache = st.toggle(
+        "Reuse cached AI responses", value=True, key="use_response_cache",
+        help="Turn off to bypass the response cache and always ask the model for a fresh answer."
+    )
+    stream_responses = st.toggle(
+        "Stream course generation", value=True, key="stream_responses",
+        help="Show the course as it is being written instead of waiting for the complete response."
+    )
+    if token_budget is not None:
+        st.subheader("🧮 Token Budgets")
+        budget_strategy = st.selectbox(
+            "When the input is over budget", token_budget.STRATEGIES,
+            index=token_budget.STRATEGIES.index(token_budget.DEFAULT_STRATEGY), key="budget_strategy",
+            format_func=lambda strategy: BUDGET_STRATEGY_LABELS[strategy],
+            help="Checked before anything is sent to the model."
+        )
+        token_budgets = {
+            feature: st.number_input(
+                f"{label} (tokens)", min_value=1000, step=1000,
+                value=token_budget.TOKEN_BUDGETS[feature], key=f"token_budget_{feature}"
+            )
+            for feature, label in BUDGET_FEATURE_LABELS.items()
+        }
+    # Filled by show_runtime_stats() at the end of the script, so the numbers
+    # include the extraction and model calls made during this run
+    runtime_stats = st.container()
+    if rate_limiter is not None:
+        show_rate_limiter_metrics()
+    if instrumentation is not None:
+        # Serves /metrics when METRICS_PORT is set; started once per server process
+        instrumentation.start_metrics_server()
+
+def show_runtime_stats():
+    """Shows cache hit rates, background job counts and operation timings."""
+    if extraction_cache is not None:
+        cache_stats = extraction_cache.stats()
+        st.caption(f"Extraction cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+    if response_cache is not None:
+        cache_stats = response_cache.stats()
+        st.caption(f"Response cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses")
+    if job_queue is not None:
+        job_counts = job_queue.job_queue.counts()
+        st.caption(f"Background jobs: {job_counts.get('running', 0)} running / {job_counts.get('queued', 0)} queued")
+    if instrumentation is not None:
+        timings = instrumentation.recorder.snapshot()
+        if timings:
+            with st.expander("⏱️ Timings"):
+                st.dataframe(
+                    [{"Operation": name, "Calls": stats["count"], "Total (s)": stats["seconds"],
+                      "Mean (s)": stats["mean_seconds"], "Max (s)": stats["max_seconds"]}
+                     for name, stats in timings.items()],
+                    hide_index=True, use_container_width=True,
+                )
+
+def show_extraction_error(source, error):
+    """Error sink for text extraction: reports a file that could not be read."""
+    st.error(f"Error reading file {source}: {error}")
+
+def plan_prompt(feature, build_prompt, text):
+    """Fits text into the feature's token budget before sending and returns the prompt."""
+    if token_budget is None:
+        return build_prompt(text)
+    plan = token_budget.plan_prompt(
+        build_prompt, text, token_budgets[feature], budget_strategy,
+        model=model, use_cache=use_response_cache
+    )
+    if plan.strategy is not None:
+        action = "summarized" if plan.strategy == "summarize" else "reduced to representative excerpts"
+        st.info(f"The input is about {plan.source_tokens:,} tokens, over the {token_budgets[feature]:,}-token budget, "
+                f"so it was {action} (prompt is now about {plan.prompt_tokens:,} tokens).")
+    return plan.prompt
+
+@st.cache_resource
+def start_job_workers(model_name, api_key):
+    """Starts the background job worker processes once per server process."""
+    return job_queue.start_workers(job_queue.JOB_WORKERS, model_name, api_key)
+
+def load_course_sections(course_sections):
+    """Stores generated full-course sections for display and export."""
+    st.session_state.course_sections = course_sections
+    st.session_state.generated_course_text = course_sections["Full Course"]
+    st.session_state.course_generated = True
+
+@st.fragment(run_every="2s")
+def show_background_job(job_id):
+    """Polls a background full-course job and loads its result once it is done."""
+    job = job_queue.job_queue.get(job_id)
+    if job is None:
+        st.warning(f"Background job {job_id} was not found.")
+    elif job["status"] in (job_queue.QUEUED, job_queue.RUNNING):
+        st.info(f"Background job `{job_id}`: {job['message']}")
+        st.progress(job["completed"] / job["total"] if job["total"] else 0)
+        st.caption("You can close this tab; reopen this page's link to attach to the job again.")
+        st.button("⏹️ Cancel Background Job", key="cancel_job_button", on_click=job_queue.job_queue.cancel, args=(job_id,))
+    elif job["status"] == job_queue.DONE:
+        load_course_sections(job["result"])
+        st.session_state.course_job_loaded = job_id
+        st.session_state.pop("full_course_job", None)
+        st.rerun()
+    elif job["status"] == job_queue.FAILED:
+        st.error(f"Background job failed: {job['error']}")
+    else:
+        st.warning("Background job was cancelled.")
+
+def cancel_generation():
+    """Button callback: marks the in-progress course generation as stopped."""
+    st.session_state.generation_cancelled = True
 
 # --- Main Application Tabs ---
 tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -1168,11 +478,22 @@ with tab1:
                 with col2:
                     with st.spinner("Analyzing documents and designing your course... This is where the magic happens! 🪄"):
                         try:
-                            raw_text = extract_text_from_files(uploaded_files_gen)
+                            raw_text = extract_text_from_files(uploaded_files_gen, on_error=show_extraction_error)
                             if raw_text.strip():
-                                prompt = prompt_utils.create_generation_prompt(raw_text, course_length, target_audience, course_tone)
-                                response = model.generate_content(prompt, request_options={'timeout': 600})
-                                st.session_state.generated_course_text = response.text # Save to session state
+                                prompt = plan_prompt("generate", lambda text: prompt_utils.create_generation_prompt(text, course_length, target_audience, course_tone), raw_text)
+                                if stream_responses:
+                                    # Render partial Markdown as chunks arrive; pressing Stop reruns the
+                                    # script, which abandons the stream and keeps the previous course
+                                    st.button("⏹️ Stop Generating", key="gen_stop_button", on_click=cancel_generation)
+                                    stream_placeholder = st.empty()
+                                    response_text = ""
+                                    for chunk in llm_utils.stream_text(model, prompt, timeout=600, use_cache=use_response_cache):
+                                        response_text += chunk
+                                        stream_placeholder.markdown(response_text)
+                                    stream_placeholder.empty() # The finished course is rendered below
+                                else:
+                                    response_text = llm_utils.generate_text(model, prompt, timeout=600, use_cache=use_response_cache)
+                                st.session_state.generated_course_text = response_text # Save to session state
                                 st.session_state.generated_quiz_text = "" # Clear any existing quiz
                             else:
                                 st.warning("HMM! Could not extract text from the uploaded files. Please check the files and try again.")
@@ -1204,13 +525,13 @@ with tab1:
                 with col2:
                     with st.spinner("Crafting your quiz from the generated course... 📝"):
                         try:
-                            prompt = prompt_utils.create_quiz_creator_prompt(
-                                st.session_state.generated_course_text, 
+                            prompt = plan_prompt("quiz", lambda text: prompt_utils.create_quiz_creator_prompt(
+                                text, 
                                 difficulty_level=quiz_difficulty, 
                                 question_type=quiz_type
-                            )
-                            response = model.generate_content(prompt, request_options={'timeout': 600})
-                            st.session_state.generated_quiz_text = response.text
+                            ), st.session_state.generated_course_text)
+                            response_text = llm_utils.generate_text(model, prompt, timeout=600, use_cache=use_response_cache)
+                            st.session_state.generated_quiz_text = response_text
                             print(st.session_state.generated_quiz_text)
                         except Exception as e:
                             st.error(f"An error occurred during quiz creation: {e}")
@@ -1232,38 +553,38 @@ with tab1:
                     
                     quiz_dl_col_1, quiz_dl_col_2, quiz_dl_col_3 = st.columns([2,2,1])
                     with quiz_dl_col_1:
-                        quiz_pdf_bytes = create_styled_pdf(st.session_state.generated_quiz_text)
                         quiz_filename = create_descriptive_filename(
                             "Quiz", 
                             quiz_params, 
                             st.session_state.generated_quiz_text, 
                             "pdf"
                         )
-                        st.download_button(
-                            label="⬇️ PDF",
-                            data=quiz_pdf_bytes,
-                            file_name=quiz_filename,
-                            mime="application/pdf",
-                            use_container_width=True
+                        export_download_button(
+                            "⬇️ PDF",
+                            st.session_state.generated_quiz_text,
+                            "pdf",
+                            quiz_filename,
+                            "application/pdf"
                         )
                     with quiz_dl_col_2:
-                        quiz_docx_bytes = create_styled_docx(st.session_state.generated_quiz_text)
                         quiz_docx_filename = create_descriptive_filename(
                             "Quiz", 
                             quiz_params, 
                             st.session_state.generated_quiz_text, 
                             "docx"
                         )
-                        st.download_button(
-                            label="⬇️ DOCX",
-                            data=quiz_docx_bytes,
-                            file_name=quiz_docx_filename,
-                            mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                            use_container_width=True
+                        export_download_button(
+                            "⬇️ DOCX",
+                            st.session_state.generated_quiz_text,
+                            "docx",
+                            quiz_docx_filename,
+                            "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
                         )
             
     
     with col2:
+        if st.session_state.pop('generation_cancelled', False):
+            st.info("Course generation stopped.")
         if not st.session_state.generated_course_text:
             st.info("Your generated course will appear here once you click the generate button.")
         else:
@@ -1281,35 +602,33 @@ with tab1:
                 
                 dl_col_1, dl_col_2, dl_col_3 = st.columns([2,2,2])
                 with dl_col_1:
-                    pdf_bytes = create_styled_pdf(st.session_state.generated_course_text)
                     course_filename = create_descriptive_filename(
                         "Course", 
                         user_params, 
                         st.session_state.generated_course_text, 
                         "pdf"
                     )
-                    st.download_button(
-                        label="⬇️ Download as PDF",
-                        data=pdf_bytes,
-                        file_name=course_filename,
-                        mime="application/pdf",
-                        use_container_width=True
+                    export_download_button(
+                        "⬇️ Download as PDF",
+                        st.session_state.generated_course_text,
+                        "pdf",
+                        course_filename,
+                        "application/pdf"
                     )
                 
                 with dl_col_2:
-                    docx_bytes = create_styled_docx(st.session_state.generated_course_text)
                     course_docx_filename = create_descriptive_filename(
                         "Course", 
                         user_params, 
                         st.session_state.generated_course_text, 
                         "docx"
                     )
-                    st.download_button(
-                        label="⬇️ Download as DOCX",
-                        data=docx_bytes,
-                        file_name=course_docx_filename,
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                        use_container_width=True
+                    export_download_button(
+                        "⬇️ Download as DOCX",
+                        st.session_state.generated_course_text,
+                        "docx",
+                        course_docx_filename,
+                        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
                     )
                         
             # Button to clear the state and start over
@@ -1330,17 +649,37 @@ with tab2:
         type=['pdf', 'docx', 'txt'],
         key="val_uploader"
     )
+    review_by_section = st.toggle(
+        "Review section by section", value=True, key="val_by_section",
+        disabled=review_pipeline is None,
+        help="Split long courses at # and ## headings (or into equal parts when there are none, as in most PDF/DOCX uploads), review the sections in parallel and merge the findings into one report."
+    )
 
     if st.button("🔍 Validate Course 🔍", use_container_width=True, key="val_button"):
         if uploaded_file_val:
             with st.spinner("Our expert is proofreading your course... 🧐"):
                 try:
-                    raw_text = extract_text_from_files([uploaded_file_val])
+                    raw_text = extract_text_from_files([uploaded_file_val], on_error=show_extraction_error)
                     if raw_text.strip():
-                        prompt = prompt_utils.create_validation_prompt(raw_text)
-                        response = model.generate_content(prompt, request_options={'timeout': 600})
+                        if review_by_section and review_pipeline is not None:
+                            progress_bar = st.progress(0)
+
+                            def show_review_progress(message, completed, total):
+                                progress_bar.progress(completed / total if total else 0, text=message)
+
+                            response_text = review_pipeline.validate_course(
+                                model,
+                                raw_text,
+                                prepare_prompt=lambda text: plan_prompt("validate", prompt_utils.create_validation_prompt, text),
+                                use_cache=use_response_cache,
+                                on_progress=show_review_progress,
+                            )
+                            progress_bar.empty()
+                        else:
+                            prompt = plan_prompt("validate", prompt_utils.create_validation_prompt, raw_text)
+                            response_text = llm_utils.generate_text(model, prompt, timeout=600, use_cache=use_response_cache)
                         st.success("YEAAH! Validation complete.")
-                        st.markdown(response.text)
+                        st.markdown(response_text)
                     else:
                         st.warning("HMM! Could not extract text from the uploaded file.")
                 except Exception as e:
@@ -1359,17 +698,37 @@ with tab3:
         type=['pdf', 'docx', 'txt'],
         key="upd_uploader"
     )
+    update_by_unit = st.toggle(
+        "Update unit by unit", value=True, key="upd_by_unit",
+        disabled=review_pipeline is None,
+        help="Split long courses at # unit headings (or into equal parts when there are none, as in most PDF/DOCX uploads), update the units in parallel and merge the suggestions into one report."
+    )
 
     if st.button("🚀 Future-Proof Course 🚀", use_container_width=True, key="upd_button"):
         if uploaded_file_upd:
             with st.spinner("Scanning the future for updates... 📡"):
                 try:
-                    raw_text = extract_text_from_files([uploaded_file_upd])
+                    raw_text = extract_text_from_files([uploaded_file_upd], on_error=show_extraction_error)
                     if raw_text.strip():
-                        prompt = prompt_utils.create_updater_prompt(raw_text)
-                        response = model.generate_content(prompt, request_options={'timeout': 600})
+                        if update_by_unit and review_pipeline is not None:
+                            progress_bar = st.progress(0)
+
+                            def show_update_progress(message, completed, total):
+                                progress_bar.progress(completed / total if total else 0, text=message)
+
+                            response_text = review_pipeline.update_course(
+                                model,
+                                raw_text,
+                                prepare_prompt=lambda text: plan_prompt("update", prompt_utils.create_updater_prompt, text),
+                                use_cache=use_response_cache,
+                                on_progress=show_update_progress,
+                            )
+                            progress_bar.empty()
+                        else:
+                            prompt = plan_prompt("update", prompt_utils.create_updater_prompt, raw_text)
+                            response_text = llm_utils.generate_text(model, prompt, timeout=600, use_cache=use_response_cache)
                         st.success("YEAAH! Here are the suggested updates.")
-                        st.markdown(response.text)
+                        st.markdown(response_text)
                     else:
                         st.warning("HMM! Could not extract text from the uploaded file.")
                 except Exception as e:
@@ -1400,12 +759,12 @@ with tab4:
         if uploaded_file_quiz:
             with st.spinner("Crafting your quiz... 📝"):
                 try:
-                    raw_text = extract_text_from_files([uploaded_file_quiz])
+                    raw_text = extract_text_from_files([uploaded_file_quiz], on_error=show_extraction_error)
                     if raw_text.strip():
-                        prompt = prompt_utils.create_quiz_creator_prompt(raw_text,difficulty_level=st.session_state.quiz_difficulty, question_type=st.session_state.quiz_type)
-                        response = model.generate_content(prompt, request_options={'timeout': 600})
+                        prompt = plan_prompt("quiz", lambda text: prompt_utils.create_quiz_creator_prompt(text, difficulty_level=st.session_state.quiz_difficulty, question_type=st.session_state.quiz_type), raw_text)
+                        response_text = llm_utils.generate_text(model, prompt, timeout=600, use_cache=use_response_cache)
                         st.success("YEAAH! Your quiz is ready!")
-                        st.markdown(response.text)
+                        st.markdown(response_text)
                     else:
                         st.warning("HMM! Could not extract text from the uploaded file.")
                 except Exception as e:
@@ -1431,87 +790,46 @@ with tab5:
         course_length = st.selectbox("Course Length", ["Quick (Overview)", "Moderate (Standard)", "Detailed (In-depth)"],key="gen_length_5")
         target_audience = st.selectbox("Target Audience", ["High School Students", "Undergraduate Students", "Industry Professionals", "General Public"], key="gen_audience_5")
         course_tone = st.selectbox("Tone of Voice", ["Formal & Academic", "Conversational & Friendly", "Technical & Precise"], key="gen_tone_5")
+        run_in_background = st.toggle(
+            "Run in the background", value=False, key="full_course_background",
+            disabled=job_queue is None,
+            help="Generate in a worker process that keeps going if this tab is closed or reruns."
+        )
         if st.button("✨ Generate Full Course Content ✨", use_container_width=True, key="gen_button_2"):
             if uploaded_files_gen:
                 with col2:
                     with st.spinner("Analyzing documents and designing your full course... This may take a few minutes 🪄"):
                         try:
-                            raw_text = extract_text_from_files(uploaded_files_gen)
-                            if raw_text.strip():
-                                # Initialize container for full course content
-                                full_course_content = ""
-                                
-                                # Store content sections separately
-                                if 'course_sections' not in st.session_state:
-                                    st.session_state.course_sections = {}
-                                
-                                # Step 1: Generate Table of Contents
-                                st.info("Step 1/3: Generating table of contents...")
-                                toc_prompt = f"""
-                                Based on the following materials, create a detailed table of contents for a {course_length} course targeted at {target_audience} with a {course_tone} tone.
-                                Create a well-structured course with 3-5 main lessons. Include lesson titles and 3-5 subtopics for each lesson.
-                                Format as a proper Markdown table of contents with # for main lesson titles and ## for subtopics.
-                                
-                                Materials:
-                                {raw_text[:10000]}
-                                """
-                                toc_response = model.generate_content(toc_prompt, request_options={'timeout': 300})
-                                table_of_contents = toc_response.text
-                                full_course_content += "# Course Table of Contents\n\n" + table_of_contents + "\n\n"
-                                
-                                # Store the table of contents section
-                                st.session_state.course_sections["Table of Contents"] = table_of_contents
-                                
-                                # Extract lesson titles
-                                lesson_titles = []
-                                for line in table_of_contents.split('\n'):
-                                    if line.strip().startswith('# '):
-                                        lesson_titles.append(line.strip()[2:])
-                                
-                                # Step 2: Generate each lesson content with its quiz
-                                st.info(f"Step 2/3: Generating {len(lesson_titles)} lessons with quizzes...")
+                            raw_text = extract_text_from_files(uploaded_files_gen, on_error=show_extraction_error)
+                            if raw_text.strip() and run_in_background and job_queue is not None:
+                                start_job_workers(model.model_name, api_key)
+                                job_id = job_queue.job_queue.submit("full-course", {
+                                    "raw_text": raw_text,
+                                    "course_length": course_length,
+                                    "target_audience": target_audience,
+                                    "course_tone": course_tone,
+                                    "use_cache": use_response_cache,
+                                })
+                                st.session_state.full_course_job = job_id
+                                st.query_params["job"] = job_id
+                            elif raw_text.strip():
+                                status_text = st.empty()
                                 progress_bar = st.progress(0)
-                                
-                                for idx, title in enumerate(lesson_titles):
-                                    # Generate lesson content
-                                    lesson_prompt = f"""
-                                    Create detailed content for the lesson titled "{title}" for a {course_length} course targeted at {target_audience}.
-                                    Use a {course_tone} tone. Include explanations, examples, and key concepts.
-                                    Format using Markdown with proper headings, bullet points, and emphasis where appropriate.
-                                    Base the content on these materials:
-                                    
-                                    {raw_text[:15000]}
-                                    """
-                                    lesson_response = model.generate_content(lesson_prompt, request_options={'timeout': 300})
-                                    lesson_content = lesson_response.text
-                                    full_course_content += f"\n\n# {title}\n\n{lesson_content}\n\n"
-                                    
-                                    # Store this lesson's content
-                                    st.session_state.course_sections[f"Lesson {idx+1}: {title}"] = lesson_content
-                                    
-                                    # Immediately generate quiz for this lesson
-                                    st.info(f"Creating quiz for lesson: {title}")
-                                    quiz_prompt = prompt_utils.create_quiz_creator_prompt(
-                                        lesson_content,
-                                        difficulty_level="Medium", 
-                                        question_type="Mixed"
-                                    )
-                                    quiz_response = model.generate_content(quiz_prompt, request_options={'timeout': 300})
-                                    quiz_content = quiz_response.text
-                                    full_course_content += f"\n\n## Quiz: {title}\n\n{quiz_content}\n\n"
-                                    
-                                    # Store this quiz's content
-                                    st.session_state.course_sections[f"Quiz {idx+1}: {title}"] = quiz_content
-                                    
-                                    # Update progress bar
-                                    progress_bar.progress((idx + 1) / len(lesson_titles))
-                                
-                                # Add "Full Course" option which contains everything
-                                st.session_state.course_sections["Full Course"] = full_course_content
-                                
-                                # Save to session state
-                                st.session_state.generated_course_text = full_course_content
-                                st.session_state.course_generated = True
+
+                                def show_progress(message, completed, total):
+                                    status_text.info(message)
+                                    progress_bar.progress(completed / total if total else 0)
+
+                                # Generate the table of contents, then lessons and quizzes concurrently
+                                load_course_sections(course_pipeline.generate_full_course(
+                                    model,
+                                    raw_text,
+                                    course_length,
+                                    target_audience,
+                                    course_tone,
+                                    use_cache=use_response_cache,
+                                    on_progress=show_progress,
+                                ))
                                 
                                 # Display success message
                                 st.success("✅ Full course generation complete with table of contents, lessons, and quizzes!")
@@ -1520,8 +838,22 @@ with tab5:
                                 st.warning("Could not extract text from the uploaded files. Please check the files and try again.")
                         except Exception as e:
                             st.error(f"An error occurred during generation: {e}")
+                            st.info("Finished lessons and quizzes were saved. Generate again with the same files and settings to resume.")
             else:
                 st.warning("Please upload at least one document to start building your course.")
+
+    # Attach to a background job from the page link, e.g. after the tab was closed
+    if job_queue is not None:
+        linked_job = st.query_params.get("job")
+        if linked_job and st.session_state.get("course_job_loaded") != linked_job:
+            st.session_state.setdefault("full_course_job", linked_job)
+        if st.session_state.get("full_course_job"):
+            attached_job = job_queue.job_queue.get(st.session_state.full_course_job)
+            if attached_job is not None and attached_job["status"] in (job_queue.QUEUED, job_queue.RUNNING):
+                # E.g. after a server restart, nothing else would start workers for a linked job
+                start_job_workers(model.model_name, api_key)
+            with col2:
+                show_background_job(st.session_state.full_course_job)
     
     with col2:
         if 'course_generated' in st.session_state and st.session_state.course_generated:
@@ -1545,33 +877,34 @@ with tab5:
                 
                 dl_col_1, dl_col_2 = st.columns(2)
                 with dl_col_1:
-                    pdf_bytes = create_styled_pdf(download_content)
                     course_filename = create_descriptive_filename(
                         section_name, 
                         user_params, 
                         download_content, 
                         "pdf"
                     )
-                    st.download_button(
-                        label=f"⬇️ Download {selected_section} as PDF",
-                        data=pdf_bytes,
-                        file_name=course_filename,
-                        mime="application/pdf",
-                        use_container_width=True
+                    export_download_button(
+                        f"⬇️ Download {selected_section} as PDF",
+                        download_content,
+                        "pdf",
+                        course_filename,
+                        "application/pdf"
                     )
                 
                 with dl_col_2:
-                    docx_bytes = create_styled_docx(download_content)
                     course_docx_filename = create_descriptive_filename(
                         section_name, 
                         user_params, 
                         download_content, 
                         "docx"
                     )
-                    st.download_button(
-                        label=f"⬇️ Download {selected_section} as DOCX",
-                        data=docx_bytes,
-                        file_name=course_docx_filename,
-                        mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                        use_container_width=True
-                    )
\ No newline at end of file
+                    export_download_button(
+                        f"⬇️ Download {selected_section} as DOCX",
+                        download_content,
+                        "docx",
+                        course_docx_filename,
+                        "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+                    )
+
+with runtime_stats:
+    show_runtime_stats()
@@ -0,0 +1,66 @@
+"""
+DOCX code-styling microbenchmark.
+
+Times building <w:shd> shading elements by parsing XML versus copying a
+cached template, then renders a code-heavy synthetic course (shaded code
+lines, styled paragraphs) with create_styled_docx and create_html_docx.
+
+    python benchmarks/bench_docx_shading.py [--code-lines 3000]
+"""
+import argparse
+import copy
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from docx.oxml import parse_xml
+
+from helpers.export_utils import create_html_docx, create_styled_docx
+
+SHADING_XML = r'<w:shd xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" w:fill="E8E8E8"/>'
+
+def make_code_course(code_lines):
+    """Returns a Markdown course where most lines are code or inline code."""
+    lines = ["# Unit 1: Working with Code"]
+    for block in range(code_lines // 30):
+        lines.append(f"## Example {block + 1}")
+        lines.append("Call `compute(x)` with `x = 1`, then read `result.value` from `cache`.")
+        lines.append("- Use `map()` and `filter()` on `items`")
+        lines.append("```python")
+        lines.extend(f"    value_{i} = compute(items[{i}], key='k{i}')  # step {i}" for i in range(30))
+        lines.append("```")
+    return "\n".join(lines)
+
+def make_code_html(code_lines):
+    parts = ["<h1>Unit 1: Working with Code</h1>"]
+    for block in range(code_lines // 30):
+        parts.append(f"<p>Call <code>compute(x)</code> with <code>x = {block}</code>.</p>")
+        parts.append("<pre>" + "<br>".join(f"value_{i} = compute(items[{i}])" for i in range(30)) + "</pre>")
+    return "".join(parts)
+
+def timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--code-lines", type=int, default=3000)
+    parser.add_argument("--elements", type=int, default=20000)
+    args = parser.parse_args()
+
+    template = parse_xml(SHADING_XML)
+    parse_seconds = timed(lambda: [parse_xml(SHADING_XML) for _ in range(args.elements)])
+    copy_seconds = timed(lambda: [copy.deepcopy(template) for _ in range(args.elements)])
+    print(f"{args.elements} shading elements: parse_xml {parse_seconds * 1000:.1f} ms, "
+          f"template copy {copy_seconds * 1000:.1f} ms ({parse_seconds / copy_seconds:.1f}x)")
+
+    course = make_code_course(args.code_lines)
+    print(f"create_styled_docx, {args.code_lines} code lines: {timed(create_styled_docx, course):.2f} s")
+    html = make_code_html(args.code_lines)
+    print(f"create_html_docx, {args.code_lines} code lines: {timed(create_html_docx, html):.2f} s")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Import-time benchmark for the text extraction module.
+
+Compares importing helpers.text_utils with importing only its parsing
+dependencies (PyPDF2 and python-docx), and with Streamlit for reference.
+
+    python benchmarks/bench_extractor_import.py [--runs N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+SCENARIOS = {
+    "PyPDF2 + docx": "import PyPDF2, docx",
+    "helpers.text_utils": "import helpers.text_utils",
+    "streamlit (reference)": "import streamlit",
+}
+
+def time_snippet(code, runs):
+    """Runs code in fresh interpreters and returns the wall-clock timings in ms."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], cwd=REPO_DIR, capture_output=True, text=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        timings.append(elapsed)
+    return timings, None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline, _ = time_snippet("pass", args.runs)
+    interpreter_ms = statistics.median(baseline)
+    print(f"Interpreter startup: {interpreter_ms:.1f} ms (subtracted below)")
+    for label, code in SCENARIOS.items():
+        timings, error = time_snippet(code, args.runs)
+        if timings is None:
+            print(f"{label:<24} unavailable ({error})")
+            continue
+        print(f"{label:<24} {statistics.median(timings) - interpreter_ms:8.1f} ms")
+    loaded, _ = time_snippet("import sys, helpers.text_utils; assert 'streamlit' not in sys.modules", 1)
+    print(f"helpers.text_utils loads streamlit: {'no' if loaded else 'yes'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+"""
+PDF wrapping benchmark: render time vs document size.
+
+Renders synthetic Markdown (create_styled_pdf) and HTML (create_html_pdf)
+documents of increasing word counts and reports the time per 1k words,
+which stays flat when line wrapping is linear in the document size.
+
+    python benchmarks/bench_pdf_wrapping.py [--sizes 1000 5000 20000]
+"""
+import argparse
+import time
+
+from corpus import make_html, make_markdown
+from helpers.export_utils import create_html_pdf, create_styled_pdf
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 5000, 20000, 50000])
+    args = parser.parse_args()
+
+    print(f"{'renderer':<18} {'words':>8} {'seconds':>9} {'ms/1k words':>12}")
+    for name, make, render in [("create_styled_pdf", make_markdown, create_styled_pdf),
+                               ("create_html_pdf", make_html, create_html_pdf)]:
+        for size in args.sizes:
+            document = make(size)
+            start = time.perf_counter()
+            render(document)
+            elapsed = time.perf_counter() - start
+            print(f"{name:<18} {size:>8} {elapsed:>9.2f} {elapsed * 1000 / (size / 1000):>12.1f}")
+
+if __name__ == "__main__":
+    main()
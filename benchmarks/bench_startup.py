@@ -0,0 +1,55 @@
+"""
+Startup-time benchmark for the package __init__.
+
+Compares the cost of importing the package (lazy: nothing is created) with
+importing it and then touching the prompts, GenAI client and chat session,
+which is what every import paid when they were created eagerly.
+
+    python benchmarks/bench_startup.py [--runs N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+PACKAGE_DIR = Path(__file__).resolve().parent.parent
+PACKAGE_NAME = PACKAGE_DIR.name
+
+SCENARIOS = {
+    "import only (lazy)": f"import {PACKAGE_NAME}",
+    "import + prompts": f"import {PACKAGE_NAME} as p; p.prompts",
+    "import + client + copilot (eager)": f"import {PACKAGE_NAME} as p; p.prompts; p.client; p.copilot",
+}
+
+def time_snippet(code, runs):
+    """Runs code in fresh interpreters and returns the wall-clock timings in ms."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, "-c", code], cwd=PACKAGE_DIR.parent,
+                                capture_output=True, text=True)
+        elapsed = (time.perf_counter() - start) * 1000
+        if result.returncode != 0:
+            return None, result.stderr.strip().splitlines()[-1]
+        timings.append(elapsed)
+    return timings, None
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    baseline, _ = time_snippet("pass", args.runs)
+    interpreter_ms = statistics.median(baseline)
+    print(f"Interpreter startup: {interpreter_ms:.1f} ms (subtracted below)")
+    for label, code in SCENARIOS.items():
+        timings, error = time_snippet(code, args.runs)
+        if timings is None:
+            print(f"{label:<36} unavailable ({error})")
+            continue
+        print(f"{label:<36} {statistics.median(timings) - interpreter_ms:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
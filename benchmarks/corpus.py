@@ -0,0 +1,124 @@
+"""
+Synthetic course corpora for the benchmarks.
+
+Markdown and HTML courses of a given word count in four variants (prose,
+code-heavy, list-heavy, Unicode-heavy), and PDF/DOCX/TXT source files
+wrapped like Streamlit uploads. Everything is seeded, so the same
+arguments always produce the same document.
+"""
+import io
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from helpers.text_utils import DOCX_TYPE, PDF_TYPE, TXT_TYPE
+
+WORDS = ("course lesson learning objective example python function variable loop data model "
+         "student review question answer concept design pattern").split()
+UNICODE_WORDS = ("café naïve résumé Übung straße façade coördinate θεωρία μάθημα урок данные "
+                 "学习 课程 数据 模型 問題 答え 개념 학생 🚀 📚 ✏️ ∑ ∫ ≤ → «citation»").split()
+
+VARIANTS = ("prose", "code", "list", "unicode")
+SOURCE_FORMATS = ("txt", "docx", "pdf")
+
+def make_paragraphs(word_count, seed=0, words=WORDS):
+    """Returns paragraphs of random words totalling about word_count words."""
+    rng = random.Random(seed)
+    paragraphs = []
+    remaining = word_count
+    while remaining > 0:
+        length = min(remaining, rng.randint(40, 160))
+        paragraphs.append(" ".join(rng.choice(words) for _ in range(length)))
+        remaining -= length
+    return paragraphs
+
+def _split_words(paragraph, size):
+    words = paragraph.split()
+    return [" ".join(words[i:i + size]) for i in range(0, len(words), size)]
+
+def make_markdown(word_count, variant="prose"):
+    """Returns a Markdown course of about word_count words in the given variant."""
+    paragraphs = make_paragraphs(word_count, words=UNICODE_WORDS if variant == "unicode" else WORDS)
+    lines = ["# Unit 1: Synthetic Course", ""]
+    for idx, paragraph in enumerate(paragraphs):
+        if idx % 5 == 0:
+            lines.append(f"## Section {idx // 5 + 1}")
+        if variant == "code":
+            lines.append("Call `compute(x)` and check `result.value`:")
+            lines.append("```python")
+            lines.extend(f"    value_{i} = compute('{chunk}')" for i, chunk in enumerate(_split_words(paragraph, 8)))
+            lines.append("```")
+        elif variant == "list":
+            for i, item in enumerate(_split_words(paragraph, 10)):
+                if i % 4 == 0:
+                    lines.append(f"{i // 4 + 1}. **{item}**")
+                else:
+                    lines.append(f"    - {item}" if i % 4 == 3 else f"- {item}")
+        else:
+            lines.append(paragraph.replace("python", "**python**").replace("loop", "`loop`")
+                         .replace("данные", "**данные**").replace("数据", "`数据`"))
+        lines.append("")
+    return "\n".join(lines)
+
+def make_html(word_count, variant="prose"):
+    """Returns an HTML course of about word_count words in the given variant."""
+    paragraphs = make_paragraphs(word_count, words=UNICODE_WORDS if variant == "unicode" else WORDS)
+    parts = ["<h1>Unit 1: Synthetic Course</h1>"]
+    for idx, paragraph in enumerate(paragraphs):
+        if idx % 5 == 0:
+            parts.append(f"<h2>Section {idx // 5 + 1}</h2>")
+        if variant == "code":
+            parts.append("<p>Call <code>compute(x)</code> and check <code>result.value</code>:</p>")
+            parts.append("<pre>" + "<br>".join(f"value_{i} = compute('{chunk}')"
+                                               for i, chunk in enumerate(_split_words(paragraph, 8))) + "</pre>")
+        elif variant == "list":
+            parts.append("<ul>" + "".join(f"<li>{item}</li>" for item in _split_words(paragraph, 10)) + "</ul>")
+        else:
+            parts.append(f"<p>{paragraph.replace('python', '<b>python</b>').replace('данные', '<b>данные</b>')}</p>")
+    return "".join(parts)
+
+class SyntheticFile(io.BytesIO):
+    """In-memory source file with the name/type/getvalue interface of a Streamlit upload."""
+
+    def __init__(self, data, name, file_type):
+        super().__init__(data)
+        self.name = name
+        self.type = file_type
+
+def make_txt(word_count):
+    text = "\n\n".join(make_paragraphs(word_count))
+    return SyntheticFile(text.encode("utf-8"), f"source_{word_count}.txt", TXT_TYPE)
+
+def make_docx(word_count):
+    import docx
+    doc = docx.Document()
+    for idx, paragraph in enumerate(make_paragraphs(word_count)):
+        if idx % 5 == 0:
+            doc.add_heading(f"Section {idx // 5 + 1}", level=2)
+        doc.add_paragraph(paragraph)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return SyntheticFile(buffer.getvalue(), f"source_{word_count}.docx", DOCX_TYPE)
+
+def make_pdf(word_count):
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+    pdf.set_font("Helvetica", size=11)
+    for idx, paragraph in enumerate(make_paragraphs(word_count)):
+        if idx % 5 == 0:
+            pdf.set_font("Helvetica", "B", 14)
+            pdf.multi_cell(0, 8, f"Section {idx // 5 + 1}", new_x="LMARGIN", new_y="NEXT")
+            pdf.set_font("Helvetica", size=11)
+        pdf.multi_cell(0, 5, paragraph, new_x="LMARGIN", new_y="NEXT")
+        pdf.ln(2)
+    return SyntheticFile(bytes(pdf.output()), f"source_{word_count}.pdf", PDF_TYPE)
+
+SOURCE_MAKERS = {"txt": make_txt, "docx": make_docx, "pdf": make_pdf}
+
+def make_source(word_count, file_format):
+    """Returns a synthetic upload of about word_count words in the given format."""
+    return SOURCE_MAKERS[file_format](word_count)
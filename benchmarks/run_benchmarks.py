@@ -0,0 +1,201 @@
+"""
+Exporter and extractor benchmark suite.
+
+Runs create_styled_pdf, create_styled_docx, create_html_pdf and
+create_html_docx on synthetic courses (prose, code-heavy, list-heavy and
+Unicode-heavy variants), and extract_text_from_files on synthetic TXT, DOCX
+and PDF sources, at each requested word count. Each case reports the best
+and median time over --repeat runs, throughput, and peak Python memory from
+a separate tracemalloc run. The extraction cache is cleared before every
+extraction run.
+
+Results can be saved as a named baseline in benchmarks/baselines/ and later
+runs compared against it; the run exits with status 1 when a case is slower
+or uses more memory than the baseline by more than --threshold.
+
+    python benchmarks/run_benchmarks.py --save main
+    python benchmarks/run_benchmarks.py --compare main
+    python benchmarks/run_benchmarks.py --sizes 1000 10000 100000 500000 --only create_styled_pdf
+"""
+import argparse
+import atexit
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BASELINES_DIR = BENCHMARKS_DIR / "baselines"
+
+# Always use a throwaway cache directory, even when COPILOT_CACHE_DIR is
+# exported, so clearing the extraction cache between runs never touches the
+# app's cache. Must be set before helpers is imported.
+BENCH_CACHE_DIR = Path(tempfile.mkdtemp(prefix="bench-cache-"))
+os.environ["COPILOT_CACHE_DIR"] = str(BENCH_CACHE_DIR)
+atexit.register(shutil.rmtree, BENCH_CACHE_DIR, ignore_errors=True)
+
+sys.path.insert(0, str(BENCHMARKS_DIR))
+
+import corpus
+from helpers.cache_utils import extraction_cache
+from helpers.export_utils import create_html_docx, create_html_pdf, create_styled_docx, create_styled_pdf
+from helpers.text_utils import extract_text_from_files
+
+# The directory cleared before every extraction run; never the shared cache
+BENCH_EXTRACTION_DIR = BENCH_CACHE_DIR / "extraction"
+if extraction_cache.directory != BENCH_EXTRACTION_DIR:
+    sys.exit("helpers was imported before the benchmark cache directory was set up")
+
+EXPORTERS = {
+    "create_styled_pdf": (create_styled_pdf, corpus.make_markdown),
+    "create_styled_docx": (create_styled_docx, corpus.make_markdown),
+    "create_html_pdf": (create_html_pdf, corpus.make_html),
+    "create_html_docx": (create_html_docx, corpus.make_html),
+}
+DEFAULT_SIZES = [1000, 10000, 100000]
+# Cases faster than this in the baseline are too noisy to flag on time
+MIN_COMPARED_SECONDS = 0.005
+
+def build_cases(sizes, variants, formats, extract_workers):
+    """Yields (name, words, make_input, run) for every benchmark case."""
+    for exporter, (render, make_document) in EXPORTERS.items():
+        for variant in variants:
+            for size in sizes:
+                yield (f"{exporter}[{variant}-{size}]", size,
+                       lambda size=size, variant=variant, make=make_document: make(size, variant), render)
+    for file_format in formats:
+        for size in sizes:
+            def extract(source):
+                shutil.rmtree(BENCH_EXTRACTION_DIR, ignore_errors=True)
+                return extract_text_from_files([source], max_workers=extract_workers)
+            yield (f"extract_text_from_files[{file_format}-{size}]", size,
+                   lambda size=size, file_format=file_format: corpus.make_source(size, file_format), extract)
+
+def input_size(document):
+    if isinstance(document, str):
+        return len(document.encode("utf-8"))
+    return document.getbuffer().nbytes
+
+def measure(run, document, repeat, max_seconds, memory):
+    """Times run(document) up to repeat times (stopping once max_seconds are spent) and traces its peak memory."""
+    times = []
+    started = time.perf_counter()
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        run(document)
+        times.append(time.perf_counter() - start)
+        if time.perf_counter() - started >= max_seconds:
+            break
+    peak = None
+    if memory:
+        tracemalloc.start()
+        try:
+            run(document)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return times, peak
+
+def run_suite(args):
+    results = {}
+    print(f"{'case':<46} {'runs':>4} {'best s':>9} {'median s':>9} {'k words/s':>10} {'MB/s':>8} {'peak MB':>8}")
+    for name, words, make_input, run in build_cases(args.sizes, args.variants, args.formats, args.extract_workers):
+        if args.only and not any(pattern in name for pattern in args.only):
+            continue
+        document = make_input()
+        times, peak = measure(run, document, args.repeat, args.max_seconds, not args.no_memory)
+        best = min(times)
+        size = input_size(document)
+        results[name] = {
+            "words": words,
+            "input_bytes": size,
+            "runs": len(times),
+            "best_seconds": round(best, 6),
+            "median_seconds": round(statistics.median(times), 6),
+            "words_per_second": round(words / best, 1),
+            "bytes_per_second": round(size / best, 1),
+            "peak_bytes": peak,
+        }
+        peak_text = f"{peak / 2**20:>8.1f}" if peak is not None else f"{'-':>8}"
+        print(f"{name:<46} {len(times):>4} {best:>9.3f} {statistics.median(times):>9.3f} "
+              f"{words / best / 1000:>10.1f} {size / best / 2**20:>8.2f} {peak_text}", flush=True)
+    return results
+
+def environment():
+    """Describes the machine and revision the results were measured on."""
+    try:
+        revision = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR,
+                                  capture_output=True, text=True, timeout=10).stdout.strip()
+    except (OSError, subprocess.SubprocessError):
+        revision = ""
+    return {
+        "revision": revision,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+def compare(results, baseline, threshold):
+    """Prints time and memory ratios against baseline; returns the number of regressions."""
+    regressions = 0
+    print(f"\nCompared with baseline from {baseline['environment'].get('created', '?')} "
+          f"(revision {baseline['environment'].get('revision') or '?'}):")
+    print(f"{'case':<46} {'time':>8} {'memory':>8}")
+    for name, result in results.items():
+        previous = baseline["results"].get(name)
+        if previous is None:
+            print(f"{name:<46} {'new':>8}")
+            continue
+        time_ratio = result["best_seconds"] / previous["best_seconds"] if previous["best_seconds"] else 1.0
+        memory_ratio = None
+        if result["peak_bytes"] and previous.get("peak_bytes"):
+            memory_ratio = result["peak_bytes"] / previous["peak_bytes"]
+        slower = time_ratio > threshold and previous["best_seconds"] >= MIN_COMPARED_SECONDS
+        regressed = slower or (memory_ratio is not None and memory_ratio > threshold)
+        regressions += regressed
+        memory_text = f"{memory_ratio:>7.2f}x" if memory_ratio is not None else f"{'-':>8}"
+        print(f"{name:<46} {time_ratio:>7.2f}x {memory_text}" + ("  REGRESSION" if regressed else ""))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="Word counts (default: 1000 10000 100000)")
+    parser.add_argument("--variants", nargs="+", choices=corpus.VARIANTS, default=list(corpus.VARIANTS))
+    parser.add_argument("--formats", nargs="+", choices=corpus.SOURCE_FORMATS, default=list(corpus.SOURCE_FORMATS),
+                        help="Source formats for the extraction cases")
+    parser.add_argument("--only", nargs="+", help="Only run cases whose name contains one of these strings")
+    parser.add_argument("--repeat", type=int, default=3, help="Timed runs per case (default: 3)")
+    parser.add_argument("--max-seconds", type=float, default=10.0, help="Stop repeating a case after this long (default: 10)")
+    parser.add_argument("--extract-workers", type=int, default=1,
+                        help="Extraction worker processes (default: 1; peak memory only covers this process)")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the tracemalloc run")
+    parser.add_argument("--save", metavar="NAME", help="Save the results as baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Compare the results with baselines/NAME.json")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="Time or memory ratio above which a case counts as a regression (default: 1.25)")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.compare:
+        baseline = json.loads((BASELINES_DIR / f"{args.compare}.json").read_text(encoding="utf-8"))
+
+    results = run_suite(args)
+
+    if args.save:
+        BASELINES_DIR.mkdir(exist_ok=True)
+        path = BASELINES_DIR / f"{args.save}.json"
+        path.write_text(json.dumps({"environment": environment(), "results": results}, indent=2) + "\n", encoding="utf-8")
+        print(f"\nSaved baseline {path}")
+    if baseline is not None and compare(results, baseline, args.threshold):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,241 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# Root directory for all on-disk caches
+CACHE_DIR = Path(os.environ.get("COPILOT_CACHE_DIR", Path(__file__).resolve().parent.parent / ".cache"))
+# Size cap for the extraction cache, in bytes
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get("EXTRACTION_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Time-to-live and size cap for cached model responses
+RESPONSE_CACHE_TTL_SECONDS = int(os.environ.get("RESPONSE_CACHE_TTL_SECONDS", 7 * 24 * 3600))
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", 128 * 1024 * 1024))
+# Checkpoints of unfinished pipeline runs are kept this long
+CHECKPOINT_TTL_SECONDS = int(os.environ.get("CHECKPOINT_TTL_SECONDS", 7 * 24 * 3600))
+
+def hash_bytes(*parts):
+    """Returns a SHA-256 hex digest over the given bytes/str parts."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode("utf-8")
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+class ExtractionCache:
+    """
+    Content-addressed disk cache for extracted documents.
+    Each entry is a JSON list of a file's extracted (kind, index, text)
+    segments, stored as <key>.json; the file mtime is used as the LRU clock
+    and the oldest entries are evicted once the size cap is exceeded.
+    """
+
+    # Entries written before segments were cached still count towards the cap
+    SUFFIXES = (".json", ".txt")
+
+    def __init__(self, directory, max_bytes):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return self.directory / f"{key}.json"
+
+    def get(self, key):
+        """Returns the cached entry text for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            text = path.read_text(encoding="utf-8")
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return text
+
+    def set(self, key, text):
+        """Stores the entry text under key and evicts least recently used entries."""
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            tmp_path = self._path(key).with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            os.replace(tmp_path, self._path(key))
+            self._evict()
+        except OSError:
+            pass  # Caching is best effort
+
+    def _evict(self):
+        with self._lock:
+            entries = []
+            for path in self.directory.iterdir():
+                if path.suffix not in self.SUFFIXES:
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    path.unlink()
+                    total -= size
+                except OSError:
+                    pass
+
+    def stats(self):
+        """Returns hit/miss counters for this process."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+class ResponseCache:
+    """
+    SQLite-backed cache for model responses with a TTL and a size cap.
+    Expired entries are dropped on write, then the least recently accessed
+    entries are evicted until the total text size fits the cap.
+    """
+
+    def __init__(self, path, ttl_seconds, max_bytes):
+        self.path = Path(path)
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        if not self._initialized:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, "
+                "created REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+            connection.commit()
+            self._initialized = True
+        return connection
+
+    def get(self, key):
+        """Returns the cached response text for key, or None on a miss."""
+        now = time.time()
+        try:
+            connection = self._connect()
+            try:
+                row = connection.execute(
+                    "SELECT text FROM responses WHERE key = ? AND created > ?",
+                    (key, now - self.ttl_seconds),
+                ).fetchone()
+                if row is not None:
+                    connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+                    connection.commit()
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError):
+            row = None
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return row[0]
+
+    def set(self, key, text):
+        """Stores a response and evicts expired and least recently used entries."""
+        now = time.time()
+        try:
+            connection = self._connect()
+            try:
+                connection.execute(
+                    "INSERT OR REPLACE INTO responses (key, text, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, text, len(text.encode("utf-8")), now, now),
+                )
+                connection.execute("DELETE FROM responses WHERE created <= ?", (now - self.ttl_seconds,))
+                total = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+                if total > self.max_bytes:
+                    for old_key, size in connection.execute(
+                        "SELECT key, size FROM responses ORDER BY accessed"
+                    ).fetchall():
+                        if total <= self.max_bytes:
+                            break
+                        connection.execute("DELETE FROM responses WHERE key = ?", (old_key,))
+                        total -= size
+                connection.commit()
+            finally:
+                connection.close()
+        except (sqlite3.Error, OSError):
+            pass  # Caching is best effort
+
+    def stats(self):
+        """Returns hit/miss counters for this process."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+class CheckpointStore:
+    """
+    Step outputs of multi-step pipeline runs, one directory per run key and
+    one text file per step. A failed run keeps its finished steps so a rerun
+    with the same key resumes from the first missing one; runs untouched for
+    ttl_seconds are pruned.
+    """
+
+    def __init__(self, directory, ttl_seconds):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+
+    def _path(self, run_key, step):
+        return self.directory / run_key / f"{step}.txt"
+
+    def get(self, run_key, step):
+        """Returns the saved output of step, or None if it has not finished."""
+        try:
+            return self._path(run_key, step).read_text(encoding="utf-8")
+        except OSError:
+            return None
+
+    def set(self, run_key, step, text):
+        """Saves the output of a finished step."""
+        path = self._path(run_key, step)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+            tmp_path.write_text(text, encoding="utf-8")
+            os.replace(tmp_path, path)
+            os.utime(path.parent)  # Keep the run from being pruned while it makes progress
+        except OSError:
+            pass  # Checkpointing is best effort
+
+    def clear(self, run_key):
+        """Deletes the checkpoints of a run, e.g. once it has finished."""
+        shutil.rmtree(self.directory / run_key, ignore_errors=True)
+
+    def prune(self):
+        """Deletes runs that have not saved a step within the TTL."""
+        cutoff = time.time() - self.ttl_seconds
+        try:
+            runs = list(self.directory.iterdir())
+        except OSError:
+            return
+        for run in runs:
+            try:
+                if run.stat().st_mtime < cutoff:
+                    shutil.rmtree(run, ignore_errors=True)
+            except OSError:
+                pass
+
+extraction_cache = ExtractionCache(CACHE_DIR / "extraction", EXTRACTION_CACHE_MAX_BYTES)
+response_cache = ResponseCache(CACHE_DIR / "responses.sqlite3", RESPONSE_CACHE_TTL_SECONDS, RESPONSE_CACHE_MAX_BYTES)
+checkpoint_store = CheckpointStore(CACHE_DIR / "checkpoints", CHECKPOINT_TTL_SECONDS)
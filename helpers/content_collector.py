@@ -0,0 +1,126 @@
+import math
+import re
+from collections import Counter
+
+# Target size of a retrieval chunk, in characters
+CHUNK_CHARS = 2000
+# Rough characters-per-token ratio used to fit chunks into a token budget
+CHARS_PER_TOKEN = 4
+CHUNK_SEPARATOR = "\n\n[...]\n\n"
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have how in into is it its of on or that the their this to was were what
+when where which who why will with you your
+""".split())
+
+def tokenize(text):
+    """Lowercases text and splits it into word tokens, dropping stopwords."""
+    return [token for token in re.findall(r"\w+", text.lower()) if token not in STOPWORDS]
+
+def estimate_tokens(text):
+    """
+    Estimates the number of model tokens in text: about CHARS_PER_TOKEN ASCII
+    characters per token, and one token per non-ASCII character, which keeps
+    the estimate conservative for accented and CJK text.
+    """
+    ascii_chars = len(text.encode("ascii", "ignore"))
+    return math.ceil(ascii_chars / CHARS_PER_TOKEN) + (len(text) - ascii_chars)
+
+def chunk_text(text, chunk_chars=CHUNK_CHARS):
+    """
+    Splits text into chunks of roughly chunk_chars characters, packing whole
+    paragraphs where possible and splitting oversized paragraphs on whitespace.
+    """
+    chunks = []
+    current = ""
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        while len(paragraph) > chunk_chars:
+            cut = paragraph.rfind(" ", 0, chunk_chars)
+            if cut <= 0:
+                cut = chunk_chars
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if current and len(current) + len(paragraph) + 2 > chunk_chars:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+class BM25Index:
+    """Okapi BM25 index over a list of text chunks."""
+
+    def __init__(self, chunks, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(tokenize(chunk)) for chunk in chunks]
+        self.lengths = [sum(counts.values()) for counts in self.term_counts]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if chunks else 0
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        total = len(chunks)
+        self.idf = {
+            term: math.log(1 + (total - freq + 0.5) / (freq + 0.5))
+            for term, freq in document_frequency.items()
+        }
+
+    def scores(self, query):
+        """Returns the BM25 score of every chunk for query."""
+        terms = tokenize(query)
+        scores = []
+        for counts, length in zip(self.term_counts, self.lengths):
+            score = 0.0
+            norm = self.k1 * (1 - self.b + self.b * length / (self.average_length or 1))
+            for term in terms:
+                freq = counts.get(term)
+                if freq:
+                    score += self.idf[term] * freq * (self.k1 + 1) / (freq + norm)
+            scores.append(score)
+        return scores
+
+    def _fit(self, ranked, token_budget, top_k=None):
+        """Takes chunks in ranked order while they fit the budget; returns them in document order."""
+        selected = []
+        used = 0
+        for idx in ranked:
+            if top_k is not None and len(selected) >= top_k:
+                break
+            cost = estimate_tokens(self.chunks[idx])
+            if used + cost > token_budget:
+                continue
+            selected.append(idx)
+            used += cost
+        return CHUNK_SEPARATOR.join(self.chunks[idx] for idx in sorted(selected))
+
+    def select(self, query, token_budget, top_k=8):
+        """
+        Returns the top_k chunks most relevant to query that fit in
+        token_budget, joined in document order. Ties (including chunks that
+        match nothing) are broken in favour of earlier chunks.
+        """
+        scores = self.scores(query)
+        ranked = sorted(range(len(self.chunks)), key=lambda idx: (-scores[idx], idx))
+        return self._fit(ranked, token_budget, top_k)
+
+    def overview(self, token_budget):
+        """Returns chunks sampled evenly across the whole corpus that fit in token_budget."""
+        if not self.chunks:
+            return ""
+        average_cost = max(1, sum(estimate_tokens(chunk) for chunk in self.chunks) // len(self.chunks))
+        count = max(1, min(len(self.chunks), token_budget // average_cost))
+        step = len(self.chunks) / count
+        ranked = [int(i * step) for i in range(count)]
+        return self._fit(ranked, token_budget)
+
+def build_index(text, chunk_chars=CHUNK_CHARS):
+    """Chunks extracted text and builds a BM25 index over it."""
+    return BM25Index(chunk_text(text, chunk_chars))
@@ -0,0 +1,165 @@
+import os
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from . import content_collector, llm_utils, prompt_utils
+from .cache_utils import checkpoint_store, hash_bytes
+
+# Maximum number of model calls in flight while generating lessons and quizzes
+LESSON_WORKERS = int(os.environ.get("LESSON_WORKERS", 4))
+# Token budgets for the source material sent with the TOC and lesson prompts
+TOC_CONTEXT_TOKENS = 2500
+LESSON_CONTEXT_TOKENS = 3750
+# Maximum number of retrieved chunks per lesson prompt
+LESSON_CONTEXT_CHUNKS = 8
+STEP_TIMEOUT = 300
+
+def extract_lesson_titles(table_of_contents):
+    """Returns the '# ' lesson titles of a Markdown table of contents."""
+    lesson_titles = []
+    for line in table_of_contents.split('\n'):
+        if line.strip().startswith('# '):
+            lesson_titles.append(line.strip()[2:])
+    return lesson_titles
+
+def extract_lesson_outline(table_of_contents):
+    """Returns {lesson title: [subtopics]} from the '# '/'## ' lines of a table of contents."""
+    outline = {}
+    current = None
+    for line in table_of_contents.split('\n'):
+        line = line.strip()
+        if line.startswith('# '):
+            current = line[2:]
+            outline.setdefault(current, [])
+        elif line.startswith('## ') and current is not None:
+            outline[current].append(line[3:])
+    return outline
+
+def course_run_key(model, raw_text, course_length, target_audience, course_tone):
+    """Returns the checkpoint key of a course run: the model, a hash of the input and the course parameters."""
+    return hash_bytes(
+        getattr(model, "model_name", type(model).__name__),
+        hash_bytes(raw_text),
+        course_length,
+        target_audience,
+        course_tone,
+    )
+
+def generate_full_course(model, raw_text, course_length, target_audience, course_tone,
+                         max_workers=None, use_cache=True, on_progress=None):
+    """
+    Generates a table of contents, then every lesson concurrently, and each
+    lesson's quiz as soon as that lesson is ready.
+    Every finished step is checkpointed under the input hash and course
+    parameters, so rerunning after a failure resumes from the missing steps;
+    the checkpoints are deleted once the course is complete.
+    Returns a dict of course sections in deterministic order (table of
+    contents, then lesson/quiz pairs, then "Full Course").
+    on_progress(message, completed, total) is called from the calling thread.
+    """
+    if max_workers is None:
+        max_workers = LESSON_WORKERS
+
+    def report(message, completed, total):
+        if on_progress:
+            on_progress(message, completed, total)
+
+    checkpoint_store.prune()
+    run_key = course_run_key(model, raw_text, course_length, target_audience, course_tone)
+
+    def run_step(step, prompt):
+        text = llm_utils.generate_text(model, prompt, STEP_TIMEOUT, use_cache=use_cache)
+        if text:
+            checkpoint_store.set(run_key, step, text)
+        return text
+
+    # Small inputs are sent whole; larger ones go through the retrieval index
+    index = content_collector.build_index(raw_text)
+    raw_tokens = content_collector.estimate_tokens(raw_text)
+
+    # Step 1: Generate Table of Contents from material sampled across the whole corpus
+    report("Step 1/3: Generating table of contents...", 0, 1)
+    table_of_contents = checkpoint_store.get(run_key, "toc")
+    if table_of_contents is None:
+        toc_context = raw_text if raw_tokens <= TOC_CONTEXT_TOKENS else index.overview(TOC_CONTEXT_TOKENS)
+        toc_prompt = prompt_utils.create_toc_prompt(toc_context, course_length, target_audience, course_tone)
+        table_of_contents = run_step("toc", toc_prompt)
+    lesson_titles = extract_lesson_titles(table_of_contents)
+    outline = extract_lesson_outline(table_of_contents)
+
+    # Step 2: Generate all lessons concurrently, then each quiz once its lesson lands
+    total = 2 * len(lesson_titles)
+    lessons = [checkpoint_store.get(run_key, f"lesson-{idx + 1}") for idx in range(len(lesson_titles))]
+    quizzes = [checkpoint_store.get(run_key, f"quiz-{idx + 1}") for idx in range(len(lesson_titles))]
+    completed = sum(text is not None for text in lessons + quizzes)
+    if completed:
+        report(f"Step 2/3: Resuming, {completed} of {total} lessons and quizzes already done...", completed, total)
+    else:
+        report(f"Step 2/3: Generating {len(lesson_titles)} lessons with quizzes...", 0, total)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        pending = {}
+
+        def submit_quiz(idx):
+            quiz_prompt = prompt_utils.create_quiz_creator_prompt(
+                lessons[idx],
+                difficulty_level="Medium",
+                question_type="Mixed"
+            )
+            pending[executor.submit(run_step, f"quiz-{idx + 1}", quiz_prompt)] = ("quiz", idx)
+
+        for idx, title in enumerate(lesson_titles):
+            if lessons[idx] is not None:
+                if quizzes[idx] is None:
+                    submit_quiz(idx)
+                continue
+            # Each lesson only receives the chunks relevant to its title and subtopics
+            if raw_tokens <= LESSON_CONTEXT_TOKENS:
+                lesson_context = raw_text
+            else:
+                query = " ".join([title] + outline.get(title, []))
+                lesson_context = index.select(query, LESSON_CONTEXT_TOKENS, top_k=LESSON_CONTEXT_CHUNKS)
+            lesson_prompt = prompt_utils.create_lesson_prompt(
+                lesson_context, title, course_length, target_audience, course_tone
+            )
+            pending[executor.submit(run_step, f"lesson-{idx + 1}", lesson_prompt)] = ("lesson", idx)
+
+        error = None
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                kind, idx = pending.pop(future)
+                if future.cancelled():
+                    continue
+                if future.exception() is not None:
+                    # Stop starting new steps, but let running ones finish so they are checkpointed
+                    if error is None:
+                        error = future.exception()
+                        for other in list(pending):
+                            if other.cancel():
+                                pending.pop(other)
+                    continue
+                text = future.result()
+                completed += 1
+                if kind == "lesson":
+                    lessons[idx] = text
+                    if error is None:
+                        submit_quiz(idx)
+                    report(f"Lesson ready, creating quiz for lesson: {lesson_titles[idx]}", completed, total)
+                else:
+                    quizzes[idx] = text
+                    report(f"Quiz ready for lesson: {lesson_titles[idx]}", completed, total)
+        if error is not None:
+            raise error
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    # Step 3: Assemble the sections in lesson order
+    course_sections = {"Table of Contents": table_of_contents}
+    full_course_content = "# Course Table of Contents\n\n" + table_of_contents + "\n\n"
+    for idx, title in enumerate(lesson_titles):
+        course_sections[f"Lesson {idx+1}: {title}"] = lessons[idx]
+        course_sections[f"Quiz {idx+1}: {title}"] = quizzes[idx]
+        full_course_content += f"\n\n# {title}\n\n{lessons[idx]}\n\n"
+        full_course_content += f"\n\n## Quiz: {title}\n\n{quizzes[idx]}\n\n"
+    course_sections["Full Course"] = full_course_content
+    checkpoint_store.clear(run_key)
+    return course_sections
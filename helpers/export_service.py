@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from . import export_utils, instrumentation
+from .cache_utils import hash_bytes
+
+# Number of background processes rendering PDF/DOCX exports
+EXPORT_WORKERS = int(os.environ.get("EXPORT_WORKERS", 2))
+# Number of finished or in-flight exports kept for reuse across reruns and sessions
+EXPORT_CACHE_ENTRIES = 32
+
+RENDERERS = {
+    "pdf": export_utils.create_styled_pdf,
+    "docx": export_utils.create_styled_docx,
+    "html-pdf": export_utils.create_html_pdf,
+    "html-docx": export_utils.create_html_docx,
+}
+
+_executor = None
+_futures = OrderedDict()
+_lock = threading.Lock()
+
+def render(text, file_format):
+    """Renders text to bytes in the given format. Runs inside a worker process."""
+    return RENDERERS[file_format](text)
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # Spawned, not forked: the Streamlit server process is multithreaded
+        _executor = ProcessPoolExecutor(max_workers=EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+    return _executor
+
+def _record_export(file_format, text, start):
+    """Returns a done callback that records the export, including time queued for a worker."""
+    def record(future):
+        if future.cancelled():
+            return
+        error = future.exception()
+        attrs = {"input_bytes": instrumentation.text_size(text)}
+        if error is None:
+            attrs["output_bytes"] = len(future.result() or b"")
+        instrumentation.recorder.record(
+            f"export.{file_format}", time.perf_counter() - start, attrs,
+            None if error is None else type(error).__name__,
+        )
+    return record
+
+def submit_export(text, file_format):
+    """
+    Queues a (text, format) export job on the worker pool and returns a
+    Future for its bytes. Jobs are shared by content, so reruns and other
+    sessions exporting the same text reuse the same Future.
+    """
+    if file_format not in RENDERERS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+    global _executor
+    key = hash_bytes(file_format, text)
+    with _lock:
+        future = _futures.get(key)
+        if future is not None and not (future.done() and future.exception() is not None):
+            _futures.move_to_end(key)
+            return future
+        try:
+            future = _get_executor().submit(render, text, file_format)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool
+            _executor = None
+            future = _get_executor().submit(render, text, file_format)
+        future.add_done_callback(_record_export(file_format, text, time.perf_counter()))
+        _futures[key] = future
+        while len(_futures) > EXPORT_CACHE_ENTRIES:
+            _futures.popitem(last=False)
+        return future
@@ -0,0 +1,221 @@
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+# Append every finished span as one JSON line to this file (disabled when empty).
+# Child processes inherit the setting, so renders in worker pools are logged too.
+METRICS_JSONL = os.environ.get("METRICS_JSONL", "")
+# Serve Prometheus text metrics on http://METRICS_HOST:METRICS_PORT/metrics (disabled when 0)
+METRICS_PORT = int(os.environ.get("METRICS_PORT", 0))
+METRICS_HOST = os.environ.get("METRICS_HOST", "127.0.0.1")
+# Upper bounds of the span duration histogram, in seconds
+DURATION_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+METRIC_PREFIX = "copilot_span"
+
+logger = logging.getLogger(__name__)
+
+# True inside unrecorded(): spans still run but are not recorded
+_unrecorded = contextvars.ContextVar("unrecorded", default=False)
+
+class Span:
+    """An open span; set() adds measurements such as byte sizes and token counts."""
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+class Recorder:
+    """
+    Aggregates finished spans per name: count, errors, a duration histogram
+    and the sums of numeric attributes (bytes, tokens). Each span is also
+    appended to jsonl_path when one is set.
+    """
+
+    def __init__(self, jsonl_path=""):
+        self.jsonl_path = jsonl_path
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._jsonl = None
+
+    def record(self, name, seconds, attrs, error=None):
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {
+                    "count": 0, "errors": 0, "seconds": 0.0, "max_seconds": 0.0,
+                    "buckets": [0] * len(DURATION_BUCKETS), "totals": {},
+                }
+            stats["count"] += 1
+            stats["errors"] += error is not None
+            stats["seconds"] += seconds
+            stats["max_seconds"] = max(stats["max_seconds"], seconds)
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    stats["buckets"][i] += 1
+            for key, value in attrs.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    stats["totals"][key] = stats["totals"].get(key, 0) + value
+            if self.jsonl_path:
+                self._write_jsonl(name, seconds, attrs, error)
+
+    def _write_jsonl(self, name, seconds, attrs, error):
+        line = {"ts": time.time(), "span": name, "seconds": round(seconds, 6), "pid": os.getpid(), **attrs}
+        if error is not None:
+            line["error"] = error
+        try:
+            if self._jsonl is None:
+                self._jsonl = open(self.jsonl_path, "a", encoding="utf-8", buffering=1)
+            self._jsonl.write(json.dumps(line, default=str) + "\n")
+        except OSError:
+            pass  # Metrics are best effort
+
+    def snapshot(self):
+        """Returns {span name: {count, errors, seconds, mean_seconds, max_seconds, attribute totals...}}."""
+        with self._lock:
+            return {
+                name: {
+                    "count": stats["count"],
+                    "errors": stats["errors"],
+                    "seconds": round(stats["seconds"], 6),
+                    "mean_seconds": round(stats["seconds"] / stats["count"], 6),
+                    "max_seconds": round(stats["max_seconds"], 6),
+                    **stats["totals"],
+                }
+                for name, stats in sorted(self._stats.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+    def render_prometheus(self):
+        """Returns all aggregates in the Prometheus text exposition format."""
+        with self._lock:
+            items = sorted(self._stats.items())
+            lines = [
+                f"# HELP {METRIC_PREFIX}_duration_seconds Duration of instrumented operations.",
+                f"# TYPE {METRIC_PREFIX}_duration_seconds histogram",
+            ]
+            for name, stats in items:
+                label = f'span="{name}"'
+                for bound, count in zip(DURATION_BUCKETS, stats["buckets"]):
+                    lines.append(f'{METRIC_PREFIX}_duration_seconds_bucket{{{label},le="{bound:g}"}} {count}')
+                lines.append(f'{METRIC_PREFIX}_duration_seconds_bucket{{{label},le="+Inf"}} {stats["count"]}')
+                lines.append(f'{METRIC_PREFIX}_duration_seconds_sum{{{label}}} {stats["seconds"]:.6f}')
+                lines.append(f'{METRIC_PREFIX}_duration_seconds_count{{{label}}} {stats["count"]}')
+            lines.append(f"# HELP {METRIC_PREFIX}_errors_total Instrumented operations that raised.")
+            lines.append(f"# TYPE {METRIC_PREFIX}_errors_total counter")
+            for name, stats in items:
+                lines.append(f'{METRIC_PREFIX}_errors_total{{span="{name}"}} {stats["errors"]}')
+            for key in sorted({key for _, stats in items for key in stats["totals"]}):
+                lines.append(f"# TYPE {METRIC_PREFIX}_{key}_total counter")
+                for name, stats in items:
+                    if key in stats["totals"]:
+                        lines.append(f'{METRIC_PREFIX}_{key}_total{{span="{name}"}} {stats["totals"][key]:g}')
+        return "\n".join(lines) + "\n"
+
+recorder = Recorder(METRICS_JSONL)
+
+@contextmanager
+def span(name, **attrs):
+    """
+    Times the block as a span called name. attrs, plus anything added with
+    Span.set() inside the block, are recorded with the duration; numeric
+    ones (e.g. input_bytes, output_tokens) are also summed per span name.
+    """
+    current = Span(name, attrs)
+    if _unrecorded.get():
+        yield current
+        return
+    error = None
+    start = time.perf_counter()
+    try:
+        yield current
+    except Exception as e:
+        error = type(e).__name__
+        raise
+    finally:
+        recorder.record(name, time.perf_counter() - start, current.attrs, error)
+
+@contextmanager
+def unrecorded():
+    """
+    Runs the block without recording its spans, for calls that only measure
+    something (such as building an empty prompt to size its template).
+    """
+    token = _unrecorded.set(True)
+    try:
+        yield
+    finally:
+        _unrecorded.reset(token)
+
+def timed(name, measure=None):
+    """
+    Decorator that records each call as a span called name.
+    measure(result, *args, **kwargs) returns extra attributes for the span.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name) as current:
+                result = func(*args, **kwargs)
+                if measure is not None:
+                    current.set(**measure(result, *args, **kwargs))
+                return result
+        return wrapper
+    return decorator
+
+def text_size(text):
+    """Returns the UTF-8 size of text in bytes."""
+    return len(text.encode("utf-8"))
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(port=None, host=None):
+    """
+    Serves render_prometheus() at /metrics from a daemon thread; at most one
+    server runs per process. Does nothing when the port is 0. Returns the
+    server, or None if it is disabled or the port is taken.
+    """
+    global _server
+    port = METRICS_PORT if port is None else port
+    if not port:
+        return None
+    with _server_lock:
+        if _server is not None:
+            return _server
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = recorder.render_prometheus().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer((host or METRICS_HOST, port), MetricsHandler)
+        except OSError as e:
+            logger.warning("Could not serve metrics on port %s: %s", port, e)
+            return None
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, name="metrics-server", daemon=True).start()
+        _server = server
+        return server
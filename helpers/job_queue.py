@@ -0,0 +1,318 @@
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from . import course_pipeline
+from .cache_utils import CACHE_DIR
+from .rate_limiter import rate_limiter
+
+# Number of worker processes started for background jobs
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# Seconds between queue polls of an idle worker
+JOB_POLL_SECONDS = 1.0
+# Running jobs without a heartbeat for this long are assumed lost and requeued
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", 900))
+# Running workers record a heartbeat this often, even during long model calls
+JOB_HEARTBEAT_SECONDS = 30.0
+# Workers back off this long after a queue database error, retrying up to
+# JOB_DB_ATTEMPTS times for result writes
+JOB_DB_RETRY_SECONDS = 5.0
+JOB_DB_ATTEMPTS = 3
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+logger = logging.getLogger(__name__)
+
+class JobCancelled(Exception):
+    """Raised inside a worker when its job was cancelled or taken over by another worker."""
+
+class JobQueue:
+    """
+    SQLite-backed queue of generation jobs shared by the UI and worker
+    processes. Jobs move from queued to running to done/failed/cancelled;
+    workers claim the oldest queued job inside an IMMEDIATE transaction, so
+    each job runs once even with many workers.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._initialized = False
+
+    def _connect(self):
+        if not self._initialized:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        connection.row_factory = sqlite3.Row
+        if not self._initialized:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, kind TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL, "
+                "message TEXT NOT NULL DEFAULT '', completed INTEGER NOT NULL DEFAULT 0, "
+                "total INTEGER NOT NULL DEFAULT 0, result TEXT, error TEXT, worker TEXT, "
+                "created REAL NOT NULL, started REAL, finished REAL, heartbeat REAL)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created)")
+            self._initialized = True
+        return connection
+
+    def submit(self, kind, params):
+        """Queues a job and returns its id."""
+        if kind not in JOB_HANDLERS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        connection = self._connect()
+        try:
+            connection.execute(
+                "INSERT INTO jobs (id, kind, params, status, message, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params), QUEUED, "Waiting for a worker...", time.time()),
+            )
+        finally:
+            connection.close()
+        return job_id
+
+    def get(self, job_id):
+        """Returns the job as a dict (params and result decoded), or None if it does not exist."""
+        connection = self._connect()
+        try:
+            row = connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        finally:
+            connection.close()
+        if row is None:
+            return None
+        job = dict(row)
+        job["params"] = json.loads(job["params"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def counts(self):
+        """Returns the number of jobs per status."""
+        connection = self._connect()
+        try:
+            rows = connection.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        finally:
+            connection.close()
+        return {status: count for status, count in rows}
+
+    def claim(self, worker):
+        """Marks the oldest queued job as running for worker and returns it, or None if the queue is empty."""
+        now = time.time()
+        connection = self._connect()
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            # Requeue jobs whose worker stopped sending heartbeats
+            connection.execute(
+                "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat < ?",
+                (QUEUED, RUNNING, now - JOB_STALE_SECONDS),
+            )
+            row = connection.execute(
+                "SELECT id FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+            ).fetchone()
+            if row is not None:
+                connection.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, started = ?, heartbeat = ?, message = ? WHERE id = ?",
+                    (RUNNING, worker, now, now, "Starting...", row["id"]),
+                )
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            # BEGIN IMMEDIATE itself may have failed (e.g. database locked)
+            if connection.in_transaction:
+                connection.execute("ROLLBACK")
+            raise
+        finally:
+            connection.close()
+        return self.get(row["id"]) if row is not None else None
+
+    def _update_owned(self, job_id, worker, assignments, values):
+        """Updates a job that worker is running; returns False if it no longer owns the job."""
+        connection = self._connect()
+        try:
+            cursor = connection.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND status = ? AND worker = ?",
+                (*values, job_id, RUNNING, worker),
+            )
+        finally:
+            connection.close()
+        return cursor.rowcount > 0
+
+    def heartbeat(self, job_id, worker):
+        """Records that worker is still running the job; returns False if it no longer owns it."""
+        return self._update_owned(job_id, worker, "heartbeat = ?", (time.time(),))
+
+    def update_progress(self, job_id, worker, message, completed, total):
+        """
+        Records progress and a heartbeat; raises JobCancelled if the job was
+        cancelled or requeued and claimed by another worker.
+        """
+        if not self._update_owned(job_id, worker, "message = ?, completed = ?, total = ?, heartbeat = ?",
+                                  (message, completed, total, time.time())):
+            raise JobCancelled(job_id)
+
+    def _finish(self, job_id, worker, status, message, result=None, error=None):
+        return self._update_owned(
+            job_id, worker, "status = ?, message = ?, result = ?, error = ?, finished = ?",
+            (status, message, json.dumps(result) if result is not None else None, error, time.time()),
+        )
+
+    def complete(self, job_id, worker, result):
+        """Stores the result; returns False if worker no longer owns the job."""
+        return self._finish(job_id, worker, DONE, "Done", result=result)
+
+    def fail(self, job_id, worker, error):
+        """Marks the job failed; returns False if worker no longer owns the job."""
+        return self._finish(job_id, worker, FAILED, "Failed", error=error)
+
+    def requeue(self, job_id, worker):
+        """Puts a running job back in the queue, e.g. when its worker is shutting down."""
+        return self._update_owned(job_id, worker, "status = ?, worker = NULL, message = ?",
+                                  (QUEUED, "Waiting for a worker..."))
+
+    def cancel(self, job_id):
+        """Cancels a queued or running job; a running job stops at its next progress update."""
+        connection = self._connect()
+        try:
+            connection.execute(
+                "UPDATE jobs SET status = ?, message = ?, finished = ? WHERE id = ? AND status IN (?, ?)",
+                (CANCELLED, "Cancelled", time.time(), job_id, QUEUED, RUNNING),
+            )
+        finally:
+            connection.close()
+
+def run_full_course_job(model, params, on_progress):
+    """Job handler: generates a full course and returns its sections."""
+    return course_pipeline.generate_full_course(
+        model,
+        params["raw_text"],
+        params["course_length"],
+        params["target_audience"],
+        params["course_tone"],
+        use_cache=params.get("use_cache", True),
+        on_progress=on_progress,
+    )
+
+JOB_HANDLERS = {"full-course": run_full_course_job}
+
+def create_model(model_name, api_key):
+    """Configures google.generativeai and returns the model used by a worker."""
+    import google.generativeai as genai
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(model_name)
+
+def _write_with_retries(func, *args):
+    """Runs a queue write, retrying transient SQLite errors; logs and gives up after JOB_DB_ATTEMPTS."""
+    for attempt in range(1, JOB_DB_ATTEMPTS + 1):
+        try:
+            return func(*args)
+        except sqlite3.Error as e:
+            logger.warning("Job queue write failed (attempt %d/%d): %s", attempt, JOB_DB_ATTEMPTS, e)
+            if attempt < JOB_DB_ATTEMPTS:
+                time.sleep(JOB_DB_RETRY_SECONDS)
+    # The job stays running and is requeued once its heartbeat goes stale
+    logger.error("Giving up on %s for job %s", func.__name__, args[0])
+
+def _send_heartbeats(queue, job_id, worker, stop, lost):
+    """Heartbeat thread of a running job; sets lost once another worker owns the job."""
+    while not stop.wait(JOB_HEARTBEAT_SECONDS):
+        try:
+            if not queue.heartbeat(job_id, worker):
+                lost.set()
+                return
+        except sqlite3.Error as e:
+            logger.warning("Could not record a heartbeat for job %s: %s", job_id, e)
+
+def _exit_on_sigterm(signum, frame):
+    # Turns terminate() into SystemExit so the running job is requeued
+    raise SystemExit(128 + signum)
+
+def run_worker(queue_path, model_name, api_key, max_jobs=None, rate_share=1.0):
+    """
+    Worker process loop: claims queued jobs and runs them until max_jobs
+    have been processed (forever by default). A job interrupted by a
+    shutdown or SIGTERM goes back to the queue. A heartbeat thread keeps the
+    job from going stale during long model calls; if the job is cancelled
+    or taken over anyway, the run stops at its next progress update and its
+    result is discarded. Queue database errors are logged and retried after
+    a pause instead of stopping the worker. rate_share is this worker's
+    fraction of the model request limits.
+    """
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    signal.signal(signal.SIGTERM, _exit_on_sigterm)
+    rate_limiter.set_share(rate_share)
+    queue = JobQueue(queue_path)
+    model = create_model(model_name, api_key)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        try:
+            job = queue.claim(worker)
+        except sqlite3.Error as e:
+            logger.warning("Could not claim a job: %s", e)
+            time.sleep(JOB_DB_RETRY_SECONDS)
+            continue
+        if job is None:
+            time.sleep(JOB_POLL_SECONDS)
+            continue
+        processed += 1
+        logger.info("Job %s (%s) started", job["id"], job["kind"])
+
+        stop, lost = threading.Event(), threading.Event()
+        threading.Thread(
+            target=_send_heartbeats, args=(queue, job["id"], worker, stop, lost), name="job-heartbeat", daemon=True
+        ).start()
+
+        def report_progress(message, completed, total, job_id=job["id"]):
+            if lost.is_set():
+                raise JobCancelled(job_id)
+            try:
+                queue.update_progress(job_id, worker, message, completed, total)
+            except sqlite3.Error as e:
+                # A missed progress update is harmless; the heartbeat thread keeps the job alive
+                logger.warning("Could not record progress of job %s: %s", job_id, e)
+
+        try:
+            result = JOB_HANDLERS[job["kind"]](model, job["params"], report_progress)
+        except JobCancelled:
+            logger.info("Job %s cancelled or taken over by another worker", job["id"])
+        except Exception as e:
+            logger.exception("Job %s failed", job["id"])
+            if _write_with_retries(queue.fail, job["id"], worker, str(e)) is False:
+                logger.warning("Job %s was taken over by another worker; dropping its error", job["id"])
+        except BaseException:
+            queue.requeue(job["id"], worker)
+            raise
+        else:
+            if _write_with_retries(queue.complete, job["id"], worker, result) is False:
+                logger.warning("Job %s was cancelled or taken over by another worker; dropping its result", job["id"])
+            else:
+                logger.info("Job %s done", job["id"])
+        finally:
+            stop.set()
+
+def start_workers(count, model_name, api_key, queue_path=None, share_with_caller=True):
+    """
+    Starts count daemon worker processes and returns them. The model request
+    limits are split evenly between the workers and, with share_with_caller,
+    the calling process, so together they stay within the configured limits.
+    """
+    count = max(0, count)
+    share = 1 / (count + 1) if share_with_caller else 1 / max(1, count)
+    if share_with_caller:
+        rate_limiter.set_share(share)
+    context = multiprocessing.get_context("spawn")
+    processes = []
+    for _ in range(count):
+        process = context.Process(
+            target=run_worker, args=(queue_path or job_queue.path, model_name, api_key, None, share), daemon=True
+        )
+        process.start()
+        processes.append(process)
+    return processes
+
+job_queue = JobQueue(CACHE_DIR / "jobs.sqlite3")
@@ -0,0 +1,283 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from .cache_utils import hash_bytes, response_cache
+from .content_collector import estimate_tokens
+from .instrumentation import span, text_size
+from .rate_limiter import rate_limiter
+
+try:
+    from google.api_core.exceptions import DeadlineExceeded, ServerError, TooManyRequests
+except ImportError:
+    DeadlineExceeded = ServerError = TooManyRequests = None
+
+# Attempts per model call; the caller's timeout bounds the whole call including backoff
+MAX_ATTEMPTS = int(os.environ.get("MODEL_MAX_ATTEMPTS", 4))
+# Per-attempt timeout for short calls that opt in (section reviews, summaries).
+# Long generations and streams give each attempt the whole remaining timeout.
+ATTEMPT_TIMEOUT = float(os.environ.get("MODEL_ATTEMPT_TIMEOUT", 120))
+# Exponential backoff with full jitter: sleep uniform(0, min(cap, base * 2**n))
+BACKOFF_BASE_SECONDS = 1.0
+BACKOFF_MAX_SECONDS = 30.0
+# Send a duplicate request when a short (attempt_timeout) call runs past the
+# p95 of recent short-call latencies; long generations are never hedged
+HEDGE_REQUESTS = os.environ.get("MODEL_HEDGE_REQUESTS", "0") == "1"
+HEDGE_PERCENTILE = 95
+HEDGE_MIN_SAMPLES = 20
+LATENCY_SAMPLES = 200
+
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+def response_cache_key(model, prompt, generation_config=None):
+    """Builds the response cache key from the model name, prompt and generation config."""
+    config = dict(getattr(model, "_generation_config", None) or {})
+    config.update(generation_config or {})
+    return hash_bytes(
+        getattr(model, "model_name", type(model).__name__),
+        json.dumps(config, sort_keys=True, default=str),
+        hash_bytes(prompt),
+    )
+
+def is_retryable_error(error):
+    """Returns True for throttling, server-side and transport errors worth retrying."""
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    if ServerError is not None and isinstance(error, (ServerError, TooManyRequests)):
+        return error.code in RETRYABLE_CODES
+    return getattr(error, "code", None) in RETRYABLE_CODES
+
+def is_deadline_error(error):
+    """Returns True when a call ran out of time (client timeout or 504 DEADLINE_EXCEEDED)."""
+    if isinstance(error, TimeoutError):
+        return True
+    if DeadlineExceeded is not None and isinstance(error, DeadlineExceeded):
+        return True
+    return getattr(error, "code", None) == 504
+
+def should_retry(error, attempt, delay, deadline, capped):
+    """
+    Decides whether a failed attempt is retried. Deadline errors are only
+    retried when the attempt was capped below the remaining timeout; an
+    attempt that already had the whole budget would just be billed again.
+    """
+    if attempt >= MAX_ATTEMPTS or not is_retryable_error(error) or time.monotonic() + delay >= deadline:
+        return False
+    return capped or not is_deadline_error(error)
+
+def backoff_delay(attempt):
+    """Returns the jittered delay before retry number attempt (1-based)."""
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** (attempt - 1)))
+
+class LatencyTracker:
+    """Keeps recent successful call latencies to derive the hedging threshold."""
+
+    def __init__(self, size):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, percent, min_samples=1):
+        """Returns the given latency percentile in seconds, or None with too few samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < max(1, min_samples):
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * percent / 100))]
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key: the first caller runs the
+    function, later callers wait for and share its result or exception.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.coalesced = 0
+
+    def do(self, key, func):
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+            else:
+                self.coalesced += 1
+        if not leader:
+            return future.result()
+        try:
+            result = func()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+# Latencies of calls with an attempt_timeout (section reviews, summaries),
+# the only ones that are hedged
+latency_tracker = LatencyTracker(LATENCY_SAMPLES)
+# Long generations are tracked apart so they do not skew the hedging threshold
+long_latency_tracker = LatencyTracker(LATENCY_SAMPLES)
+# Identical uncached requests in flight at the same time share one model call
+single_flight = SingleFlight()
+_hedge_executor = ThreadPoolExecutor(thread_name_prefix="hedged-call")
+
+def _request_attrs(model, prompt):
+    return {
+        "model": getattr(model, "model_name", type(model).__name__),
+        "input_bytes": text_size(prompt),
+        "input_tokens": estimate_tokens(prompt),
+    }
+
+def _response_attrs(text):
+    return {"output_bytes": text_size(text or ""), "output_tokens": estimate_tokens(text or "")}
+
+def _generate_once(model, prompt, generation_config, timeout, tracker=latency_tracker):
+    """One rate-limited generate_content attempt; returns the response text."""
+    with rate_limiter.slot(), span("llm.generate_content", **_request_attrs(model, prompt)) as current:
+        start = time.monotonic()
+        response = model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            request_options={'timeout': timeout},
+        )
+        text = response.text
+        current.set(**_response_attrs(text))
+    tracker.record(time.monotonic() - start)
+    return text
+
+def _generate_hedged(model, prompt, generation_config, timeout):
+    """
+    Like _generate_once, but sends a duplicate request once the first runs
+    past the recent short-call p95 latency and returns whichever succeeds
+    first. The slower request cannot be cancelled; its result is discarded.
+    """
+    threshold = latency_tracker.percentile(HEDGE_PERCENTILE, HEDGE_MIN_SAMPLES)
+    if threshold is None:
+        return _generate_once(model, prompt, generation_config, timeout)
+    primary = _hedge_executor.submit(_generate_once, model, prompt, generation_config, timeout)
+    done, _ = wait([primary], timeout=threshold)
+    if not done:
+        hedge = _hedge_executor.submit(_generate_once, model, prompt, generation_config, timeout)
+        pending = {primary, hedge}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    return future.result()
+    return primary.result()
+
+def generate_text(model, prompt, timeout=600, generation_config=None, use_cache=True, hedge=None, attempt_timeout=None):
+    """
+    Calls model.generate_content and returns the response text.
+    Responses are served from the persistent response cache unless use_cache
+    is False; fresh responses are always stored. Calls to the model go
+    through the process-wide rate limiter.
+    Transient failures are retried with jittered exponential backoff within
+    timeout. Each attempt gets at most attempt_timeout seconds (default: the
+    whole remaining timeout, for long generations); timed-out attempts are
+    only retried when they were capped shorter than that. With hedge
+    (default HEDGE_REQUESTS), a slow attempt of a call with an
+    attempt_timeout is raced against a duplicate request; long generations
+    are never hedged. Concurrent calls with the same cache key are
+    coalesced into one upstream request.
+    """
+    key = response_cache_key(model, prompt, generation_config)
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+
+    if hedge is None:
+        hedge = HEDGE_REQUESTS
+    return single_flight.do(key, lambda: _generate_with_retries(
+        model, prompt, generation_config, timeout, hedge, key, attempt_timeout
+    ))
+
+def _generate_with_retries(model, prompt, generation_config, timeout, hedge, key, attempt_timeout=None):
+    """Runs the model call with retries and stores a non-empty response in the cache."""
+    if attempt_timeout is None:
+        # Long generations: a duplicate would double the most expensive calls
+        call = lambda *args: _generate_once(*args, tracker=long_latency_tracker)
+    else:
+        call = _generate_hedged if hedge else _generate_once
+    deadline = time.monotonic() + timeout
+    attempt = 1
+    while True:
+        remaining = deadline - time.monotonic()
+        capped = attempt_timeout is not None and attempt_timeout < remaining
+        try:
+            text = call(model, prompt, generation_config, max(1.0, attempt_timeout if capped else remaining))
+            break
+        except Exception as e:
+            delay = backoff_delay(attempt)
+            if not should_retry(e, attempt, delay, deadline, capped):
+                raise
+        time.sleep(delay)
+        attempt += 1
+    if text:
+        response_cache.set(key, text)
+    return text
+
+def stream_text(model, prompt, timeout=600, generation_config=None, use_cache=True):
+    """
+    Like generate_text, but yields the response text in chunks as the model
+    produces them. A caller that stops early closes the generator (as a
+    Streamlit rerun does when the user presses Stop), which abandons the
+    stream and records it as cancelled; only complete responses are stored
+    in the cache. Failures are retried like
+    generate_text only until the first chunk has been yielded. The timeout
+    covers the whole streamed response, so attempts are never capped shorter.
+    """
+    key = response_cache_key(model, prompt, generation_config)
+    if use_cache:
+        cached = response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+
+    parts = []
+    deadline = time.monotonic() + timeout
+    attempt = 1
+    while True:
+        attempt_timeout = max(1.0, deadline - time.monotonic())
+        try:
+            # The rate-limiter slot is held until the stream is finished or abandoned
+            with rate_limiter.slot(), span("llm.generate_content", stream=True, **_request_attrs(model, prompt)) as current:
+                response = model.generate_content(
+                    prompt,
+                    generation_config=generation_config,
+                    request_options={'timeout': attempt_timeout},
+                    stream=True,
+                )
+                for chunk in response:
+                    text = chunk.text
+                    if text:
+                        parts.append(text)
+                        try:
+                            yield text
+                        except GeneratorExit:
+                            current.set(cancelled=True, **_response_attrs("".join(parts)))
+                            raise
+                current.set(**_response_attrs("".join(parts)))
+            break
+        except Exception as e:
+            delay = backoff_delay(attempt)
+            if parts or not should_retry(e, attempt, delay, deadline, capped=False):
+                raise
+        time.sleep(delay)
+        attempt += 1
+    text = "".join(parts)
+    if text:
+        response_cache.set(key, text)
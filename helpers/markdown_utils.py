@@ -0,0 +1,75 @@
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+INLINE_PATTERN = re.compile(r'(\*\*.*?\*\*|\*.*?\*|\`.*?\`)')
+
+# A styled run of inline text: style is '', 'bold', 'italic' or 'code'
+Span = namedtuple("Span", ["style", "text"])
+
+# A block-level element of a Markdown document.
+# kind is 'heading', 'bullet', 'paragraph', 'blank' or 'code'.
+# Headings, bullets and paragraphs carry their source text (without the
+# marker) and its inline spans; code blocks carry their raw lines and
+# whether the closing fence was found.
+Block = namedtuple("Block", ["kind", "level", "text", "spans", "lines", "closed"],
+                   defaults=(0, "", (), (), True))
+
+@lru_cache(maxsize=1024)
+def parse_inline(text):
+    """Splits a line into Spans for **bold**, *italic* and `code` markup."""
+    spans = []
+    for part in INLINE_PATTERN.split(text):
+        if not part:
+            continue
+        if part.startswith('**') and part.endswith('**'):
+            spans.append(Span('bold', part[2:-2]))
+        elif part.startswith('*') and part.endswith('*'):
+            spans.append(Span('italic', part[1:-1]))
+        elif part.startswith('`') and part.endswith('`'):
+            spans.append(Span('code', part[1:-1]))
+        else:
+            spans.append(Span('', part))
+    return tuple(spans)
+
+@lru_cache(maxsize=32)
+def parse_markdown(text):
+    """
+    Parses Markdown into a tuple of Blocks in a single pass.
+    Results are memoized by content, so the PDF and DOCX exporters share one
+    parse of the same text across reruns.
+    """
+    blocks = []
+    code_lines = None
+    for line in text.split('\n'):
+        # Code block handling
+        if line.strip().startswith('```'):
+            if code_lines is None:
+                code_lines = []
+            else:
+                blocks.append(Block('code', lines=tuple(code_lines)))
+                code_lines = None
+            continue
+
+        if code_lines is not None:
+            code_lines.append(line)
+            continue
+
+        line = line.strip()
+        if not line:
+            blocks.append(Block('blank'))
+        elif line.startswith('# '):
+            blocks.append(Block('heading', 1, line[2:].strip()))
+        elif line.startswith('## '):
+            blocks.append(Block('heading', 2, line[3:].strip()))
+        elif line.startswith('### '):
+            blocks.append(Block('heading', 3, line[4:].strip()))
+        elif line.startswith(('* ', '- ')):
+            content = line[2:].strip()
+            blocks.append(Block('bullet', text=content, spans=parse_inline(content)))
+        else:
+            blocks.append(Block('paragraph', text=line, spans=parse_inline(line)))
+
+    if code_lines is not None:
+        blocks.append(Block('code', lines=tuple(code_lines), closed=False))
+    return tuple(blocks)
@@ -1,3 +1,10 @@
+from .content_collector import estimate_tokens
+from .instrumentation import text_size, timed
+
+def _measure_prompt(prompt, *args, **kwargs):
+    return {"output_bytes": text_size(prompt), "output_tokens": estimate_tokens(prompt)}
+
+@timed("prompt.create_generation_prompt", _measure_prompt)
 def create_generation_prompt(text, length, audience, tone):
     """Creates a detailed prompt for the course generation feature."""
     return f"""
@@ -19,6 +26,7 @@ def create_generation_prompt(text, length, audience, tone):
     5.  Format the Output: Present the entire course in clear, readable Markdown. Use '#' for Unit titles, '##' for Chapters, and '###' for Lessons.
     """
 
+@timed("prompt.create_validation_prompt", _measure_prompt)
 def create_validation_prompt(course_text):
     """Creates a detailed prompt for the course validation feature."""
     return f"""
@@ -31,6 +39,7 @@ def create_validation_prompt(course_text):
     Output Format: Present your findings in a Markdown table with three columns: "Issue Detected (with quote)", "Explanation", and "Suggested Correction".
     """
 
+@timed("prompt.create_updater_prompt", _measure_prompt)
 def create_updater_prompt(course_text):
     """Creates a detailed prompt for the course updater feature."""
     return f"""
@@ -43,6 +52,7 @@ def create_updater_prompt(course_text):
     Output Format: Structure your suggestions into three distinct Markdown sections: '### 🚀 Suggested Additions', '### ✏️ Suggested Modifications', and '### 🗑️ Suggested Deletions'. For each suggestion, explain *why* the change is necessary.
     """
 
+@timed("prompt.create_quiz_creator_prompt", _measure_prompt)
 def create_quiz_creator_prompt(course_text, difficulty_level="Medium", question_type="Mixed"):
     """Creates a detailed prompt for the quiz creator feature."""
     return f"""
@@ -82,4 +92,40 @@ def create_quiz_creator_prompt(course_text, difficulty_level="Medium", question_
     Use only standard Markdown formatting - no HTML tags or custom styling.
     For all questions explain the correct answer in a separate paragraph after the question and why other options are incorrect.
     Add a sperator line after each question to separate them clearly.
-    """
\ No newline at end of file
+    """
+
+@timed("prompt.create_toc_prompt", _measure_prompt)
+def create_toc_prompt(text, length, audience, tone):
+    """Creates the table of contents prompt for the full course generator."""
+    return f"""
+    Based on the following materials, create a detailed table of contents for a {length} course targeted at {audience} with a {tone} tone.
+    Create a well-structured course with 3-5 main lessons. Include lesson titles and 3-5 subtopics for each lesson.
+    Format as a proper Markdown table of contents with # for main lesson titles and ## for subtopics.
+
+    Materials:
+    {text}
+    """
+
+@timed("prompt.create_lesson_prompt", _measure_prompt)
+def create_lesson_prompt(text, title, length, audience, tone):
+    """Creates the prompt for a single lesson of the full course generator."""
+    return f"""
+    Create detailed content for the lesson titled "{title}" for a {length} course targeted at {audience}.
+    Use a {tone} tone. Include explanations, examples, and key concepts.
+    Format using Markdown with proper headings, bullet points, and emphasis where appropriate.
+    Base the content on these materials:
+
+    {text}
+    """
+
+@timed("prompt.create_summary_prompt", _measure_prompt)
+def create_summary_prompt(text, max_words):
+    """Creates the prompt that condenses source material to fit a token budget."""
+    return f"""
+    Summarize the following material in at most {max_words} words for use as course source material.
+    Keep key concepts, definitions, facts, figures and examples; drop repetition and filler.
+    Use plain Markdown.
+
+    Material:
+    {text}
+    """
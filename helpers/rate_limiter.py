@@ -0,0 +1,141 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    from google.api_core.exceptions import TooManyRequests
+except ImportError:
+    TooManyRequests = None
+
+# Sustained request rate and burst size allowed towards the model provider
+MODEL_REQUESTS_PER_MINUTE = float(os.environ.get("MODEL_REQUESTS_PER_MINUTE", 60))
+MODEL_REQUEST_BURST = int(os.environ.get("MODEL_REQUEST_BURST", 10))
+# Bounds and starting point of the adaptive concurrency window
+MODEL_MIN_CONCURRENCY = int(os.environ.get("MODEL_MIN_CONCURRENCY", 1))
+MODEL_MAX_CONCURRENCY = int(os.environ.get("MODEL_MAX_CONCURRENCY", 16))
+MODEL_INITIAL_CONCURRENCY = int(os.environ.get("MODEL_INITIAL_CONCURRENCY", 4))
+
+def is_throttling_error(error):
+    """Returns True for provider rate-limit errors (HTTP 429 / RESOURCE_EXHAUSTED)."""
+    if TooManyRequests is not None and isinstance(error, TooManyRequests):
+        return True
+    return getattr(error, "code", None) == 429
+
+class RateLimiter:
+    """
+    Token bucket plus an AIMD concurrency window for model calls.
+    A call needs a bucket token and a free slot in the window. While the
+    window is full, every successful call grows it by 1/window (about one
+    slot per window of successes); a throttled call halves it and empties
+    the bucket, so callers back off together and ramp up again while calls
+    succeed.
+    """
+
+    def __init__(self, requests_per_minute, burst, min_window, max_window, initial_window):
+        self._limits = (requests_per_minute, burst, max_window)
+        self.share = 1.0
+        self.rate = requests_per_minute / 60
+        self.burst = max(1, burst)
+        self.min_window = max(1, min_window)
+        self.max_window = max(self.min_window, max_window)
+        self.window = float(min(max(initial_window, self.min_window), self.max_window))
+        self.tokens = float(self.burst)
+        self.in_flight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.throttled = 0
+        self._updated = time.monotonic()
+        self._condition = threading.Condition()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """Blocks until the bucket and the concurrency window admit one more call."""
+        with self._condition:
+            self.waiting += 1
+            try:
+                while True:
+                    self._refill()
+                    if self.in_flight < int(self.window) and self.tokens >= 1:
+                        self.tokens -= 1
+                        self.in_flight += 1
+                        return
+                    # Wake up when the next token is due, or when a call finishes
+                    timeout = (1 - self.tokens) / self.rate if self.tokens < 1 and self.rate > 0 else None
+                    self._condition.wait(timeout)
+            finally:
+                self.waiting -= 1
+
+    def release(self, throttled=False):
+        """Frees a slot and adapts the window to the outcome of the call."""
+        with self._condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled += 1
+                self.window = max(self.min_window, self.window / 2)
+                self.tokens = 0.0
+                self._updated = time.monotonic()
+            else:
+                self.completed += 1
+                # Only grow while the window is the limit, so idle periods do not inflate it
+                if self.in_flight + 1 >= int(self.window):
+                    self.window = min(self.max_window, self.window + 1 / self.window)
+            self._condition.notify_all()
+
+    @contextmanager
+    def slot(self):
+        """Holds a rate-limited slot for the duration of one model call."""
+        self.acquire()
+        throttled = False
+        try:
+            yield
+        except Exception as e:
+            throttled = is_throttling_error(e)
+            raise
+        finally:
+            self.release(throttled)
+
+    def set_share(self, share):
+        """
+        Limits this process to a fraction of the configured rate, burst and
+        maximum window, for processes that split one provider quota.
+        """
+        requests_per_minute, burst, max_window = self._limits
+        with self._condition:
+            self.share = share
+            self.rate = requests_per_minute * share / 60
+            self.burst = max(1, round(burst * share))
+            self.tokens = min(self.tokens, self.burst)
+            self.max_window = max(self.min_window, round(max_window * share))
+            self.window = min(self.window, self.max_window)
+            self._condition.notify_all()
+
+    def metrics(self):
+        """Returns the current window, in-flight calls, queue depth and counters."""
+        with self._condition:
+            self._refill()
+            return {
+                "window": round(self.window, 2),
+                "in_flight": self.in_flight,
+                "queue_depth": self.waiting,
+                "tokens": round(self.tokens, 2),
+                "completed": self.completed,
+                "throttled": self.throttled,
+                "share": round(self.share, 3),
+            }
+
+# Shared by every Streamlit session and batch job in this process. The limits
+# are per process: job_queue.start_workers splits them between the processes
+# it starts and the caller; separately started processes each get the full
+# limits, so lower MODEL_REQUESTS_PER_MINUTE for those.
+rate_limiter = RateLimiter(
+    MODEL_REQUESTS_PER_MINUTE,
+    MODEL_REQUEST_BURST,
+    MODEL_MIN_CONCURRENCY,
+    MODEL_MAX_CONCURRENCY,
+    MODEL_INITIAL_CONCURRENCY,
+)
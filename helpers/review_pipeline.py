@@ -0,0 +1,247 @@
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from . import content_collector, llm_utils, prompt_utils
+
+# Maximum number of section reviews in flight
+REVIEW_WORKERS = int(os.environ.get("REVIEW_WORKERS", 4))
+# Adjacent small sections are packed together up to this many tokens
+SECTION_TOKENS = 6000
+SECTION_TIMEOUT = 300
+
+HEADING_PATTERN = re.compile(r'(#{1,6})\s+(.*)')
+TABLE_SEPARATOR_CELL = re.compile(r':?-{3,}:?')
+
+def _split_by_size(title, body, target_tokens):
+    """Splits an oversized section into parts of about target_tokens, titled "<title> (part n)"."""
+    # Extracted DOCX text has one paragraph per line; treat lines as paragraphs
+    if '\n\n' not in body:
+        body = body.replace('\n', '\n\n')
+    chunks = []
+    heading = ""  # Heading-only chunk waiting to be joined to the text it introduces
+    for chunk in content_collector.chunk_text(body, target_tokens * content_collector.CHARS_PER_TOKEN):
+        if all(HEADING_PATTERN.match(line.strip()) for line in chunk.split('\n') if line.strip()):
+            heading += chunk + '\n\n'
+        else:
+            chunks.append(heading + chunk)
+            heading = ""
+    if heading:
+        if chunks:
+            chunks[-1] += '\n\n' + heading.strip()
+        else:
+            chunks.append(heading.strip())
+    return [
+        (f"{title} (part {number})" if title else f"Part {number}", chunk)
+        for number, chunk in enumerate(chunks, 1)
+    ]
+
+def split_sections(text, max_level=2, target_tokens=SECTION_TOKENS):
+    """
+    Splits Markdown at headings up to max_level ('#' and '##' by default),
+    ignoring '#' lines inside code blocks, and packs adjacent sections
+    together while they fit in target_tokens. Sections larger than
+    target_tokens, such as PDF/DOCX text without Markdown headings, are
+    split by size instead.
+    Returns a list of (title, text) in document order; a pack is titled
+    with the titles of all of its sections.
+    """
+    sections = []
+    title, lines = "", []
+    in_code = False
+    for line in text.split('\n'):
+        stripped = line.strip()
+        match = HEADING_PATTERN.match(stripped)
+        if stripped.startswith('```'):
+            in_code = not in_code
+        elif not in_code and match and len(match.group(1)) <= max_level:
+            if any(l.strip() for l in lines):
+                sections.append((title, '\n'.join(lines)))
+            title, lines = match.group(2).strip(), []
+        lines.append(line)
+    if any(l.strip() for l in lines):
+        sections.append((title, '\n'.join(lines)))
+
+    packed = []  # (titles, text)
+    for title, body in sections:
+        if content_collector.estimate_tokens(body) > target_tokens:
+            packed.extend(([part_title], part) for part_title, part in _split_by_size(title, body, target_tokens))
+        elif packed and content_collector.estimate_tokens(packed[-1][1] + body) <= target_tokens:
+            packed[-1] = (packed[-1][0] + [title], packed[-1][1] + '\n' + body)
+        else:
+            packed.append(([title], body))
+    return [(", ".join(t or "Introduction" for t in titles) if titles != [""] else "", body) for titles, body in packed]
+
+def run_section_prompts(model, titles, prompts, max_workers=None, use_cache=True, on_progress=None):
+    """
+    Sends one prompt per section concurrently and returns the responses in
+    section order. on_progress(message, completed, total) is called from the
+    calling thread as sections finish.
+    """
+    if max_workers is None:
+        max_workers = REVIEW_WORKERS
+    responses = [None] * len(prompts)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        futures = {
+            executor.submit(
+                llm_utils.generate_text, model, prompt, SECTION_TIMEOUT,
+                use_cache=use_cache, attempt_timeout=llm_utils.ATTEMPT_TIMEOUT,
+            ): idx
+            for idx, prompt in enumerate(prompts)
+        }
+        for completed, future in enumerate(as_completed(futures), 1):
+            idx = futures[future]
+            responses[idx] = future.result()
+            if on_progress:
+                on_progress(f"Section ready: {titles[idx] or 'Introduction'}", completed, len(prompts))
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+    return responses
+
+def _split_row(line):
+    cells = re.split(r'(?<!\\)\|', line.strip())
+    # Drop the empty cells outside the leading and trailing pipes
+    if cells and not cells[0].strip():
+        cells = cells[1:]
+    if cells and not cells[-1].strip():
+        cells = cells[:-1]
+    return [cell.strip() for cell in cells]
+
+def parse_markdown_table(text):
+    """Returns (header, rows) of the first Markdown table in text, or (None, []) if there is none."""
+    header, rows = None, []
+    for line in text.split('\n'):
+        if not line.strip().startswith('|'):
+            if header is not None:
+                break
+            continue
+        cells = _split_row(line)
+        if header is None:
+            header = cells
+        elif all(TABLE_SEPARATOR_CELL.fullmatch(cell) for cell in cells if cell):
+            continue
+        else:
+            rows.append((cells + [''] * len(header))[:len(header)])
+    return header, rows
+
+def _normalize(cell):
+    return re.sub(r'[\W_]+', ' ', cell).strip().lower()
+
+def merge_validation_reports(titles, responses):
+    """
+    Merges the per-section validation tables into one Markdown table with a
+    leading Section column. A finding reported identically by several
+    sections is listed once with all of their titles in its Section cell;
+    sections that answered without a table are appended as notes.
+    """
+    header = None
+    rows = []  # (section titles, cells)
+    seen = {}  # normalized cells -> index in rows
+    notes = []
+    for title, response in zip(titles, responses):
+        section_header, section_rows = parse_markdown_table(response)
+        if section_header is None:
+            notes.append((title, response.strip()))
+            continue
+        header = header or section_header
+        section = (title or "Introduction").replace('|', '\\|')
+        for row in section_rows:
+            row = (row + [''] * len(header))[:len(header)]
+            key = tuple(_normalize(cell) for cell in row)
+            if key not in seen:
+                seen[key] = len(rows)
+                rows.append(([], row))
+            sections = rows[seen[key]][0]
+            if section not in sections:
+                sections.append(section)
+
+    parts = []
+    if header is not None:
+        table = ["| Section | " + " | ".join(header) + " |", "|" + "---|" * (len(header) + 1)]
+        table.extend("| " + " | ".join([", ".join(sections)] + row) + " |" for sections, row in rows)
+        parts.append("\n".join(table))
+    for title, note in notes:
+        if note:
+            parts.append(f"### Notes: {title or 'Introduction'}\n\n{note}")
+    return "\n\n".join(parts)
+
+def validate_course(model, course_text, prepare_prompt=None, max_workers=None, use_cache=True, on_progress=None):
+    """
+    Map-reduce validation: reviews each '#'/'##' section of the course
+    concurrently and merges the findings into one deduplicated report.
+    prepare_prompt(section_text) builds each prompt in the calling thread
+    (default: create_validation_prompt). Courses that form a single section
+    are reviewed with one call and returned as is.
+    """
+    if prepare_prompt is None:
+        prepare_prompt = prompt_utils.create_validation_prompt
+    sections = split_sections(course_text)
+    titles = [title for title, _ in sections]
+    prompts = [prepare_prompt(text) for _, text in sections]
+    responses = run_section_prompts(model, titles, prompts, max_workers, use_cache, on_progress)
+    if len(responses) == 1:
+        return responses[0]
+    return merge_validation_reports(titles, responses)
+
+# Headings of the updater's three output sections, matched by their emoji
+UPDATE_SECTIONS = (
+    ("🚀", "### 🚀 Suggested Additions"),
+    ("✏", "### ✏️ Suggested Modifications"),
+    ("🗑", "### 🗑️ Suggested Deletions"),
+)
+
+def parse_update_sections(response):
+    """
+    Splits an updater response into {marker: text} for the 🚀/✏️/🗑️
+    sections. Text outside those sections is returned under None.
+    """
+    sections = {}
+    current = None
+    for line in response.split('\n'):
+        match = HEADING_PATTERN.match(line.strip())
+        if match:
+            marker = next((marker for marker, _ in UPDATE_SECTIONS if marker in match.group(2)), None)
+            if marker is not None:
+                current = marker
+                continue
+        sections.setdefault(current, []).append(line)
+    return {marker: '\n'.join(lines).strip() for marker, lines in sections.items()}
+
+def merge_update_reports(titles, responses):
+    """
+    Merges per-unit updater responses into one 🚀/✏️/🗑️ report with the
+    suggestions grouped by unit under each section. Units whose response has
+    none of the three sections are appended as notes.
+    """
+    parsed = [parse_update_sections(response) for response in responses]
+    parts = []
+    for marker, heading in UPDATE_SECTIONS:
+        entries = [
+            f"#### {title or 'Introduction'}\n\n{sections[marker]}"
+            for title, sections in zip(titles, parsed) if sections.get(marker)
+        ]
+        parts.append(heading + "\n\n" + ("\n\n".join(entries) if entries else "No suggestions."))
+    for title, sections in zip(titles, parsed):
+        if not any(marker in sections for marker, _ in UPDATE_SECTIONS) and sections.get(None):
+            parts.append(f"### Notes: {title or 'Introduction'}\n\n{sections[None]}")
+    return "\n\n".join(parts)
+
+def update_course(model, course_text, prepare_prompt=None, max_workers=None, use_cache=True, on_progress=None):
+    """
+    Runs the updater on each '#' unit of the course concurrently and merges
+    the 🚀/✏️/🗑️ sections across units into one report. Text without '#'
+    units (e.g. from PDF/DOCX uploads) and oversized units are split into
+    parts by size.
+    prepare_prompt(unit_text) builds each prompt in the calling thread
+    (default: create_updater_prompt). A course that forms a single unit is
+    updated with one call and returned as is.
+    """
+    if prepare_prompt is None:
+        prepare_prompt = prompt_utils.create_updater_prompt
+    units = split_sections(course_text, max_level=1)
+    titles = [title for title, _ in units]
+    prompts = [prepare_prompt(text) for _, text in units]
+    responses = run_section_prompts(model, titles, prompts, max_workers, use_cache, on_progress)
+    if len(responses) == 1:
+        return responses[0]
+    return merge_update_reports(titles, responses)
@@ -1,30 +1,256 @@
-import streamlit as st
 import PyPDF2
 import docx
 import io
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from .cache_utils import extraction_cache, hash_bytes
+from .content_collector import estimate_tokens
+from .instrumentation import span, text_size
 
-def extract_text_from_files(uploaded_files):
-    """Reads and extracts text from uploaded PDF, DOCX, and TXT files."""
-    full_text = ""
+PDF_TYPE = "application/pdf"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+TXT_TYPE = "text/plain"
+
+# Bump whenever extraction output changes so stale cache entries are ignored
+EXTRACTOR_VERSION = "2"
+
+# Number of worker processes used by extract_text_from_files (1 = serial)
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", os.cpu_count() or 1))
+# When extraction runs on the pool, PDFs with more pages than this are split
+# into page ranges of this size
+PDF_PAGES_PER_JOB = 25
+# Uploads smaller than this in total are parsed in this process; the pool
+# only pays off for large documents
+EXTRACTION_PARALLEL_MIN_BYTES = int(os.environ.get("EXTRACTION_PARALLEL_MIN_BYTES", 1024 * 1024))
+
+# A piece of extracted text and where it came from
+Segment = namedtuple("Segment", ["source", "kind", "index", "text"])
+
+# Extraction errors go to an on_error(source, error) callback so callers
+# decide how to surface them; without one they are logged.
+logger = logging.getLogger(__name__)
+
+def log_extraction_error(source, error):
+    """Default error sink: logs a file that could not be read."""
+    logger.warning("Error reading file %s: %s", source, error)
+
+def _iter_pdf_pages(data, first_index=0):
+    """Yields (kind, index, text) parts for the pages of PDF bytes, numbered from first_index."""
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+    for index, page in enumerate(pdf_reader.pages, first_index):
+        page_text = page.extract_text()
+        if page_text:
+            yield "page", index, page_text + "\n\n"
+
+def _iter_docx_paragraphs(data):
+    """Yields (kind, index, text) parts for the paragraphs of DOCX bytes."""
+    doc = docx.Document(io.BytesIO(data))
+    for index, para in enumerate(doc.paragraphs):
+        yield "paragraph", index, para.text + "\n"
+
+def _iter_txt(data):
+    """Yields the decoded text of plain text bytes as a single part."""
+    yield "text", 0, data.decode("utf-8") + "\n\n"
+
+def _run_job(job):
+    """Runs a single extraction job in a worker process. Returns (parts, error)."""
+    func, args = job
+    parts = []
+    try:
+        for part in func(*args):
+            parts.append(part)
+    except Exception as e:
+        return parts, e
+    return parts, None
+
+def _pdf_page_range(pdf_reader, start, stop):
+    """Returns pages [start, stop) of a parsed PDF as the bytes of a smaller PDF."""
+    writer = PyPDF2.PdfWriter()
+    for page in pdf_reader.pages[start:stop]:
+        writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+def _plan_jobs(file, data, split=False):
+    """
+    Turns one uploaded file into extraction jobs. With split, large PDFs
+    become one job per page range, each carrying only its own pages, so
+    workers neither receive nor parse the whole document.
+    """
+    if file.type == PDF_TYPE:
+        if split:
+            pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+            page_count = len(pdf_reader.pages)
+            if page_count > PDF_PAGES_PER_JOB:
+                return [(_iter_pdf_pages, (_pdf_page_range(pdf_reader, start, start + PDF_PAGES_PER_JOB), start))
+                        for start in range(0, page_count, PDF_PAGES_PER_JOB)]
+        return [(_iter_pdf_pages, (data,))]
+    elif file.type == DOCX_TYPE:
+        return [(_iter_docx_paragraphs, (data,))]
+    elif file.type == TXT_TYPE:
+        return [(_iter_txt, (data,))]
+    return []
+
+_executor = None
+_executor_workers = 0
+_executor_lock = threading.Lock()
+
+def _get_executor(max_workers):
+    """
+    Returns the long-lived extraction pool, recreated if the worker count
+    changed or a worker died. Workers are spawned, not forked, because the
+    Streamlit server process is multithreaded.
+    """
+    global _executor, _executor_workers
+    with _executor_lock:
+        if _executor is None or _executor_workers != max_workers:
+            if _executor is not None:
+                _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+            _executor_workers = max_workers
+        return _executor
+
+def _discard_executor(executor):
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+
+def _iter_job_outputs(jobs, max_workers):
+    """
+    Yields (job_number, part, error) tuples in job order. Jobs run lazily in
+    this process, or in the shared process pool when more than one worker is
+    allowed.
+    """
+    if max_workers > 1 and len(jobs) > 1:
+        executor = _get_executor(max_workers)
+        futures = []
+        try:
+            try:
+                futures = [executor.submit(_run_job, job) for job in jobs]
+            except BrokenProcessPool:
+                _discard_executor(executor)
+                executor = _get_executor(max_workers)
+                futures = [executor.submit(_run_job, job) for job in jobs]
+            for number, future in enumerate(futures):
+                try:
+                    parts, error = future.result()
+                except BrokenProcessPool as e:
+                    _discard_executor(executor)
+                    parts, error = [], e
+                for part in parts:
+                    yield number, part, None
+                if error is not None:
+                    yield number, None, error
+        finally:
+            for future in futures:
+                future.cancel()
+    else:
+        for number, (func, args) in enumerate(jobs):
+            try:
+                for part in func(*args):
+                    yield number, part, None
+            except Exception as e:
+                yield number, None, e
+
+def iter_extracted_segments(uploaded_files, max_workers=None, on_error=None):
+    """
+    Yields Segment tuples (source, kind, index, text) extracted from uploaded
+    PDF, DOCX, and TXT files in upload order: one per PDF page, DOCX paragraph
+    or TXT file. Concatenating the texts gives the full extracted document.
+    Files that fail are reported once as on_error(file name, exception)
+    and contribute no further segments.
+    """
     if not uploaded_files:
-        return ""
-    
+        return
+    if max_workers is None:
+        max_workers = EXTRACTION_WORKERS
+    if on_error is None:
+        on_error = log_extraction_error
+
+    # Serve files from the extraction cache and plan jobs for the rest
+    plans = []  # (file, cache key, cached parts)
+    pending = []  # (plan position, file, data) of the files that need parsing
     for file in uploaded_files:
         try:
             # Move the file pointer back to the beginning before reading
             file.seek(0)
-            if file.type == "application/pdf":
-                pdf_reader = PyPDF2.PdfReader(io.BytesIO(file.getvalue()))
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        full_text += page_text + "\n\n"
-            elif file.type == "application/vnd.openxmlformats-officedocument.wordprocessingml.document":
-                doc = docx.Document(io.BytesIO(file.getvalue()))
-                for para in doc.paragraphs:
-                    full_text += para.text + "\n"
-            elif file.type == "text/plain":
-                full_text += file.getvalue().decode("utf-8") + "\n\n"
+            data = file.getvalue()
+            key = hash_bytes(EXTRACTOR_VERSION, file.type, data)
+            cached = extraction_cache.get(key)
+            if cached is not None:
+                plans.append((file, None, json.loads(cached)))
+                continue
         except Exception as e:
-            st.error(f"Error reading file {file.name}: {e}")
-    return full_text
\ No newline at end of file
+            on_error(file.name, e)
+            continue
+        pending.append((len(plans), file, data))
+        plans.append((file, key, None))
+
+    if sum(len(data) for _, _, data in pending) < EXTRACTION_PARALLEL_MIN_BYTES:
+        max_workers = 1
+    jobs = []  # (plan position, job)
+    for position, file, data in pending:
+        try:
+            file_jobs = _plan_jobs(file, data, split=max_workers > 1)
+        except Exception as e:
+            on_error(file.name, e)
+            plans[position] = (file, None, [])  # Nothing to emit or cache
+            continue
+        jobs.extend((position, job) for job in file_jobs)
+
+    owners = [owner for owner, _ in jobs]
+    outputs = _iter_job_outputs([job for _, job in jobs], max_workers)
+    current = -1
+    parts = []  # Parts of the file in progress, kept for the cache
+    failed = False
+    for number, part, error in itertools.chain(outputs, [(None, None, None)]):
+        owner = len(plans) if number is None else owners[number]
+        # Finish the file in progress and emit cached files up to the next owner
+        while current < owner:
+            if current >= 0 and plans[current][1] is not None and not failed:
+                extraction_cache.set(plans[current][1], json.dumps(parts))
+            current += 1
+            parts = []
+            failed = False
+            if current < len(plans) and plans[current][2] is not None:
+                for kind, index, text in plans[current][2]:
+                    yield Segment(plans[current][0].name, kind, index, text)
+        if number is None:
+            break
+        if failed:
+            continue  # The file was already reported; skip its remaining jobs
+        file = plans[owner][0]
+        if error is not None:
+            on_error(file.name, error)
+            failed = True
+            continue
+        parts.append(part)
+        yield Segment(file.name, *part)
+
+def _file_size(file):
+    size = getattr(file, "size", None)
+    return size if size is not None else file.getbuffer().nbytes
+
+def extract_text_from_files(uploaded_files, max_workers=None, on_error=None):
+    """
+    Reads and extracts text from uploaded PDF, DOCX, and TXT files.
+    With more than one worker, files and page ranges of large PDFs are parsed
+    in a process pool; results are reassembled in upload order.
+    """
+    with span("extract.files", files=len(uploaded_files or [])) as current:
+        text = "".join(segment.text for segment in iter_extracted_segments(uploaded_files, max_workers, on_error))
+        current.set(
+            input_bytes=sum(_file_size(file) for file in uploaded_files or []),
+            output_bytes=text_size(text),
+            output_tokens=estimate_tokens(text),
+        )
+    return text
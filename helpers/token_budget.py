@@ -0,0 +1,94 @@
+import os
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from . import content_collector, llm_utils, prompt_utils
+from .instrumentation import unrecorded
+
+# Default input-token budget per feature; override with e.g. TOKEN_BUDGET_VALIDATE=50000
+DEFAULT_TOKEN_BUDGET = 100_000
+FEATURES = ("generate", "validate", "update", "quiz")
+TOKEN_BUDGETS = {
+    feature: int(os.environ.get(f"TOKEN_BUDGET_{feature.upper()}", DEFAULT_TOKEN_BUDGET))
+    for feature in FEATURES
+}
+
+# What to do with source text that does not fit the budget
+CHUNK, SUMMARIZE, REJECT = "chunk", "summarize", "reject"
+STRATEGIES = (CHUNK, SUMMARIZE, REJECT)
+DEFAULT_STRATEGY = os.environ.get("TOKEN_BUDGET_STRATEGY", CHUNK)
+
+# Number of summary calls in flight for the summarize strategy
+SUMMARY_WORKERS = int(os.environ.get("SUMMARY_WORKERS", 4))
+SUMMARY_TIMEOUT = 300
+
+# The planned prompt, the strategy that was applied (None if the text fit)
+# and the estimated token counts of the source text and the final prompt
+PromptPlan = namedtuple("PromptPlan", ["prompt", "strategy", "source_tokens", "prompt_tokens"])
+
+class TokenBudgetExceeded(ValueError):
+    """Raised when a prompt cannot be sent within its token budget."""
+
+    def __init__(self, estimated_tokens, budget):
+        super().__init__(
+            f"The input is about {estimated_tokens:,} tokens, which exceeds the budget of {budget:,} tokens."
+        )
+        self.estimated_tokens = estimated_tokens
+        self.budget = budget
+
+estimate_tokens = content_collector.estimate_tokens
+
+def chunk_to_budget(text, token_budget):
+    """Keeps chunks sampled evenly across text that together fit in token_budget."""
+    return content_collector.build_index(text).overview(token_budget)
+
+def summarize_to_budget(model, text, token_budget, use_cache=True):
+    """
+    Summarizes text piece by piece (pieces are summarized concurrently) so
+    the joined summaries fit in token_budget; anything still over budget is
+    trimmed with chunk_to_budget.
+    """
+    piece_tokens = max(token_budget, 1000)
+    pieces = content_collector.chunk_text(text, piece_tokens * content_collector.CHARS_PER_TOKEN)
+    # Words per summary so that all summaries together stay within the budget
+    max_words = max(50, int(token_budget / len(pieces) * 0.75))
+    prompts = [prompt_utils.create_summary_prompt(piece, max_words) for piece in pieces]
+    with ThreadPoolExecutor(max_workers=max(1, SUMMARY_WORKERS)) as executor:
+        summaries = list(executor.map(
+            lambda prompt: llm_utils.generate_text(
+                model, prompt, SUMMARY_TIMEOUT, use_cache=use_cache, attempt_timeout=llm_utils.ATTEMPT_TIMEOUT
+            ),
+            prompts,
+        ))
+    summary = "\n\n".join(summaries)
+    if estimate_tokens(summary) > token_budget:
+        summary = chunk_to_budget(summary, token_budget)
+    return summary
+
+def plan_prompt(build_prompt, text, token_budget, strategy=DEFAULT_STRATEGY, model=None, use_cache=True):
+    """
+    Builds build_prompt(text) and checks it against token_budget before
+    anything is sent. Source text that does not fit is chunked, summarized
+    (which needs model) or rejected with TokenBudgetExceeded.
+    Returns a PromptPlan.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown token budget strategy: {strategy}")
+    source_tokens = estimate_tokens(text)
+    # Size the prompt template without recording a prompt.* span for it
+    with unrecorded():
+        overhead = estimate_tokens(build_prompt(""))
+    if source_tokens + overhead <= token_budget:
+        prompt = build_prompt(text)
+        return PromptPlan(prompt, None, source_tokens, estimate_tokens(prompt))
+
+    available = token_budget - overhead
+    if strategy == REJECT or available <= 0:
+        raise TokenBudgetExceeded(source_tokens + overhead, token_budget)
+    if strategy == SUMMARIZE:
+        if model is None:
+            raise ValueError("The summarize strategy needs a model")
+        fitted = summarize_to_budget(model, text, available, use_cache=use_cache)
+    else:
+        fitted = chunk_to_budget(text, available)
+    prompt = build_prompt(fitted)
+    return PromptPlan(prompt, strategy, source_tokens, estimate_tokens(prompt))